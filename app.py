@@ -1,28 +1,74 @@
-from fastapi import FastAPI, File, UploadFile, BackgroundTasks, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, Request, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 import os
 import time
+import asyncio
+import json
 import uuid
-import shutil
 import threading
-import requests
-from sarvamai import SarvamAI
-from sarvamai.play import save
+import hashlib
+import hmac
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List
 import io
 import dotenv
+from starlette.concurrency import run_in_threadpool
 
 # Import custom modules
-from utils.LLM import findsolution
-from utils.translate import chunk_text, translate_text
+from utils.clients import warmup
+from utils.scheduler import JobScheduler, estimate_job_cost
+from utils.singleflight import SingleFlight
+from utils.faqIndex import get_faq_index
+from utils.wavStream import IncrementalWavParser
+from utils.audioWorkers import encode_audio, pcm_to_wav
+from utils.vad import EnergyEndpointer
+from utils.statusStore import StatusStore
+from utils.metrics import stage_latency
+from utils.resultsLog import log_result, results_log
+from utils.housekeeping import housekeeper, resolve_path, shard_path, start_housekeeping
+from utils.profiler import profile
+from utils.autotune import get_chunk_size
+from utils.engine import Engine
 
 # Load environment variables
 dotenv.load_dotenv()
 SARVAM_AI_API = os.environ.get("SARVAM_AI_API")
+# Default for requests that do not choose an answer mode explicitly
+DIRECT_ANSWER = os.environ.get("DIRECT_ANSWER", "false").lower() == "true"
+# Uploads larger than this are rejected with 413 while they are being received
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+UPLOAD_READ_SIZE = 64 * 1024
+# Length of the STT segments dispatched while a streamed upload is still arriving
+STT_SEGMENT_MS = get_chunk_size("stt_chunk_ms")
+FILE_READ_SIZE = 64 * 1024
+# Admission control: reject new work with 429 beyond this many queued jobs or this estimated wait (seconds)
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", 100))
+MAX_ESTIMATED_WAIT = float(os.environ.get("MAX_ESTIMATED_WAIT", 60))
+# Number of upload hashes / idempotency keys remembered for duplicate detection
+RESULT_INDEX_SIZE = int(os.environ.get("RESULT_INDEX_SIZE", 10000))
+# Longest time GET /status may hold a request open waiting for a state change
+MAX_STATUS_WAIT = float(os.environ.get("MAX_STATUS_WAIT", 30))
+# Token required by /debug/profile (send as X-Debug-Token); the endpoint is disabled when unset
+DEBUG_TOKEN = os.environ.get("DEBUG_TOKEN")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Pre-warm SDKs, connection pools and audio workers before the server reports ready"""
+    await run_in_threadpool(warmup)
+    await run_in_threadpool(get_faq_index)
+    job_scheduler.start()
+    start_housekeeping()
+    yield
+    job_scheduler.stop()
+    housekeeper.stop()
+    results_log.close()
 
 # Create FastAPI app
 app = FastAPI(title="Voice Processing API", 
-              description="API for processing voice inputs, translating, and providing information about Bengali culture and heritage")
+              description="API for processing voice inputs, translating, and providing information about Bengali culture and heritage",
+              lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -37,42 +83,186 @@ app.add_middleware(
 os.makedirs("audio_chunks", exist_ok=True)
 os.makedirs("responses", exist_ok=True)
 
-# Track processing status
-processing_status = {}
+# Track processing status (versioned, so /status can long-poll and revalidate)
+processing_status = StatusStore()
+batch_status = {}
+
+# Content hash / idempotency key -> request ID, so retried uploads attach to the existing job
+result_index = OrderedDict()
+result_index_lock = threading.Lock()
+
+# Pipeline jobs run shortest-first with per-client fair queuing
+job_scheduler = JobScheduler()
+
+# Response formats for /audio/{filename}; compressed versions are encoded once and cached next to the WAV
+AUDIO_FORMATS = {
+    "wav": {"media_type": "audio/wav", "accept": ("audio/wav", "audio/x-wav", "audio/wave")},
+    "ogg": {"media_type": "audio/ogg", "accept": ("audio/ogg", "audio/opus")},
+    "mp3": {"media_type": "audio/mpeg", "accept": ("audio/mpeg", "audio/mp3")},
+}
+encode_flight = SingleFlight()
+
+# Pipeline engine shared by queued jobs and WebSocket sessions; its STT pool also
+# transcribes segments of uploads that are still streaming in
+engine = Engine()
+
+def get_client_id(request: Request):
+    """Identify the caller for fair scheduling (X-Client-ID header, else remote address)"""
+    client_id = request.headers.get("x-client-id")
+    if client_id:
+        return client_id
+    return request.client.host if request.client else "anonymous"
+
+def find_existing_job(key: str):
+    """Return the request ID of a live or completed job registered under key, if any"""
+    if not key:
+        return None
+    with result_index_lock:
+        request_id = result_index.get(key)
+        if request_id is None:
+            return None
+        status = processing_status.get(request_id)
+        merged_audio = (status or {}).get("result", {}).get("merged_audio")
+        if status is None or status.get("status") == "error" or (merged_audio and not os.path.exists(merged_audio)):
+            # Failed jobs, and jobs whose audio housekeeping has removed, are not reused
+            del result_index[key]
+            return None
+        result_index.move_to_end(key)
+        return request_id
+
+def remember_job(key: str, request_id: str):
+    """Register a job under a content hash or idempotency key"""
+    if not key:
+        return
+    with result_index_lock:
+        result_index[key] = request_id
+        result_index.move_to_end(key)
+        while len(result_index) > RESULT_INDEX_SIZE:
+            result_index.popitem(last=False)
+
+def content_key(digest: str, direct_answer: bool, latency_target: float = None):
+    return f"sha256:{digest}:{'direct' if direct_answer else 'translated'}:{latency_target or ''}"
+
+def idempotency_key(request: Request):
+    key = request.headers.get("idempotency-key")
+    return f"key:{get_client_id(request)}:{key}" if key else None
+
+def existing_job_response(request_id: str):
+    """Response for an upload that attached to an existing job"""
+    status = processing_status.get(request_id, {})
+    return {
+        "request_id": request_id,
+        "status": status.get("status", "processing"),
+        "message": "Duplicate upload, attached to existing job",
+        "duplicate": True
+    }
+
+def check_admission(new_jobs: int = 1):
+    """Reject new work with 429 and Retry-After when the job queue is saturated"""
+    queued = job_scheduler.queued()
+    estimated_wait = job_scheduler.estimated_wait()
+    
+    if queued + new_jobs > MAX_QUEUED_JOBS or estimated_wait > MAX_ESTIMATED_WAIT:
+        # Suggest retrying once the backlog beyond the wait limit should have drained
+        retry_after = max(int(estimated_wait - MAX_ESTIMATED_WAIT / 2), 1)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {queued} jobs queued, estimated wait {estimated_wait:.0f}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+def new_upload_path(request_id: str):
+    """Path for a new upload; it is kept out of the audio_chunks quota until discard_upload()"""
+    audio_path = shard_path("audio_chunks", f"upload_{request_id}.wav")
+    housekeeper.protect(audio_path)
+    return audio_path
+
+def discard_upload(audio_path: str):
+    """Delete an upload whose job is finished (or never started)"""
+    housekeeper.release(audio_path)
+    if os.path.exists(audio_path):
+        os.remove(audio_path)
+
+def save_upload(upload: UploadFile, audio_path: str):
+    """Copy an uploaded file to disk, enforcing MAX_UPLOAD_BYTES; returns its SHA-256 hex digest"""
+    received = 0
+    digest = hashlib.sha256()
+    with open(audio_path, "wb") as buffer:
+        while True:
+            data = upload.file.read(UPLOAD_READ_SIZE)
+            if not data:
+                break
+            received += len(data)
+            if received > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+            digest.update(data)
+            buffer.write(data)
+    return digest.hexdigest()
 
 @app.get("/")
 async def root():
     """Root endpoint to check if API is running"""
-    return {"message": "Voice Processing API is running"}
+    return {
+        "message": "Voice Processing API is running",
+        "queued_jobs": job_scheduler.queued(),
+        "active_jobs": job_scheduler.active(),
+        "estimated_wait": round(job_scheduler.estimated_wait(), 1),
+        "stage_latency": stage_latency.snapshot()
+    }
 
 @app.post("/process-audio/")
-async def process_audio(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def process_audio(request: Request, file: UploadFile = File(...),
+                        direct_answer: bool = Form(DIRECT_ANSWER), latency_target: float = Form(None)):
     """
     Process uploaded audio file through the complete pipeline:
     1. Convert speech to text
     2. Generate response about Bengali culture using Gemini
     3. Translate to Bengali
     4. Convert Bengali text to speech
+    
+    With direct_answer=true, Gemini answers in Bengali directly and step 3 is
+    skipped (falling back to translation if the answer fails validation).
+    latency_target (seconds from transcript to the last audio chunk) limits the
+    answer length; without it answers aim for ANSWER_SECONDS of speech.
     """
+    # A retry with the same idempotency key gets the original job
+    key = idempotency_key(request)
+    existing = find_existing_job(key)
+    if existing:
+        return existing_job_response(existing)
+    
+    # Shed load before writing anything to disk
+    check_admission()
+    
     # Generate a unique ID for this request
     request_id = str(uuid.uuid4())
     
     # Create a temporary file to store the uploaded audio
-    audio_path = f"audio_chunks/upload_{request_id}.wav"
+    audio_path = new_upload_path(request_id)
     
     try:
-        # Save uploaded file
-        with open(audio_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Save uploaded file, hashing it on the way (off the event loop)
+        digest = await run_in_threadpool(save_upload, file, audio_path)
+        
+        # Identical recording already processed or in flight: attach to that job
+        existing = find_existing_job(content_key(digest, direct_answer, latency_target))
+        if existing:
+            discard_upload(audio_path)
+            remember_job(key, existing)
+            return existing_job_response(existing)
         
         # Initialize processing status
         processing_status[request_id] = {
             "status": "processing",
-            "message": "Audio received, processing started"
+            "message": "Audio received, queued for processing"
         }
         
-        # Process in background
-        background_tasks.add_task(process_audio_background, audio_path, request_id)
+        remember_job(content_key(digest, direct_answer, latency_target), request_id)
+        remember_job(key, request_id)
+        
+        # Queue for a pipeline worker; short recordings are scheduled first
+        job_scheduler.submit(process_audio_background, audio_path, request_id, direct_answer, None, latency_target,
+                             client_id=get_client_id(request), cost=estimate_job_cost(audio_path))
         
         return {
             "request_id": request_id,
@@ -80,16 +270,101 @@ async def process_audio(background_tasks: BackgroundTasks, file: UploadFile = Fi
             "message": "Audio processing started"
         }
     
+    except HTTPException:
+        discard_upload(audio_path)
+        raise
     except Exception as e:
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        discard_upload(audio_path)
         raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
 
-async def process_audio_background(audio_path: str, request_id: str):
+@app.post("/process-audio/stream")
+async def process_audio_stream(request: Request, direct_answer: bool = DIRECT_ANSWER, latency_target: float = None):
+    """
+    Process a WAV file sent as the raw request body (e.g. chunked transfer).
+    The stream is parsed as it arrives and each completed STT segment is
+    transcribed immediately, so transcription overlaps the upload.
+    """
+    key = idempotency_key(request)
+    existing = find_existing_job(key)
+    if existing:
+        return existing_job_response(existing)
+    
+    # Shed load before reading the body
+    check_admission()
+    
+    request_id = str(uuid.uuid4())
+    audio_path = new_upload_path(request_id)
+    parser = IncrementalWavParser(STT_SEGMENT_MS)
+    digest = hashlib.sha256()
+    stt_futures = []
+    received = 0
+    
+    try:
+        # File I/O runs off the event loop, as in save_upload()
+        buffer = await run_in_threadpool(open, audio_path, "wb")
+        try:
+            async for data in request.stream():
+                received += len(data)
+                if received > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+                digest.update(data)
+                await run_in_threadpool(buffer.write, data)
+                
+                for segment in parser.feed(data):
+                    stt_futures.append(engine.submit_segment(segment))
+        finally:
+            await run_in_threadpool(buffer.close)
+        
+        for segment in parser.finish():
+            stt_futures.append(engine.submit_segment(segment))
+    
+    except Exception as e:
+        for future in stt_futures:
+            future.cancel()
+        discard_upload(audio_path)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+    
+    existing = find_existing_job(content_key(digest.hexdigest(), direct_answer, latency_target))
+    if existing:
+        for future in stt_futures:
+            future.cancel()
+        discard_upload(audio_path)
+        remember_job(key, existing)
+        return existing_job_response(existing)
+    
+    # Not PCM WAV: transcribe the saved file as a whole instead
+    if not parser.header_parsed:
+        stt_futures = None
+    
+    processing_status[request_id] = {
+        "status": "processing",
+        "message": "Audio received, queued for processing"
+    }
+    remember_job(content_key(digest.hexdigest(), direct_answer, latency_target), request_id)
+    remember_job(key, request_id)
+    
+    job_scheduler.submit(process_audio_background, audio_path, request_id, direct_answer, stt_futures, latency_target,
+                         client_id=get_client_id(request), cost=estimate_job_cost(audio_path))
+    
+    return {
+        "request_id": request_id,
+        "status": "processing",
+        "message": "Audio processing started"
+    }
+
+def process_audio_background(audio_path: str, request_id: str, direct_answer: bool = False, stt_futures: list = None,
+                             latency_target: float = None):
     """Background task to process audio through the pipeline"""
     try:
+        # Transcripts of streamed segments were started during the upload
+        english_text = None
+        if stt_futures is not None:
+            english_text = " ".join(t.strip() for t in (f.result() for f in stt_futures) if t.strip())
+        
         # Process the audio through our pipeline
-        result = process_audio_pipeline(audio_path)
+        result = asyncio.run(run_pipeline_job(audio_path, request_id, direct_answer, english_text, latency_target))
         
         # Update processing status
         processing_status[request_id] = {
@@ -97,118 +372,439 @@ async def process_audio_background(audio_path: str, request_id: str):
             "message": "Processing completed",
             "result": result
         }
+        log_result(source="api", request_id=request_id, **result)
         
         # Clean up the audio file
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        discard_upload(audio_path)
             
     except Exception as e:
         processing_status[request_id] = {
             "status": "error",
             "message": f"Error processing audio: {str(e)}"
         }
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
+        discard_upload(audio_path)
+
+async def run_pipeline_job(audio_path: str, request_id: str, direct_answer: bool, english_text: str,
+                           latency_target: float):
+    """Run the engine for a queued job, publishing each stage to /status as soon as it completes"""
+    progress = {}
+    async for event in engine.run(audio_path, transcript=english_text, request_id=request_id,
+                                  direct_answer=direct_answer, latency_target=latency_target):
+        if event["type"] == "done":
+            return event["result"]
+        
+        if event["type"] == "audio":
+            progress.setdefault("audio_files", []).append(os.path.basename(event["file"]))
+        else:
+            progress[event["type"]] = event["text"]
+        processing_status[request_id] = {
+            "status": "processing",
+            "message": f"Stage completed: {event['type']}",
+            "progress": dict(progress)
+        }
 
-def process_audio_pipeline(audio_path: str):
-    """Process audio through the complete pipeline"""
-    # Step 1: Speech to Text (English)
-    english_text = speech_to_text(audio_path)
+@app.post("/process-audio/batch")
+async def process_audio_batch(request: Request, files: List[UploadFile] = File(...),
+                              direct_answer: bool = Form(DIRECT_ANSWER), latency_target: float = Form(None)):
+    """
+    Process many uploaded audio files in one request.
+    Each file gets its own request ID (pollable via /status/{request_id}),
+    and the whole upload is tracked under a single batch ID.
+    """
+    # A batch larger than the whole queue could never be admitted; retrying will not help
+    if len(files) > MAX_QUEUED_JOBS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(files)} files exceeds the limit of {MAX_QUEUED_JOBS}; split it into smaller batches"
+        )
+    check_admission(new_jobs=len(files))
     
-    if not english_text or not english_text.strip():
-        return {"error": "No speech detected or transcription failed"}
+    batch_id = str(uuid.uuid4())
+    items = []
+    audio_path = None
     
-    # Step 2: Generate solution using Gemini
-    solution = findsolution(english_text)
+    try:
+        for upload in files:
+            request_id = str(uuid.uuid4())
+            audio_path = new_upload_path(request_id)
+            
+            digest = await run_in_threadpool(save_upload, upload, audio_path)
+            
+            # Recordings already processed (or repeated within the batch) reuse that job
+            existing = find_existing_job(content_key(digest, direct_answer, latency_target))
+            if existing:
+                discard_upload(audio_path)
+                items.append({"request_id": existing, "filename": upload.filename, "audio_path": None})
+                continue
+            
+            processing_status[request_id] = {
+                "status": "processing",
+                "message": "Audio received, queued in batch",
+                "batch_id": batch_id
+            }
+            remember_job(content_key(digest, direct_answer, latency_target), request_id)
+            items.append({"request_id": request_id, "filename": upload.filename, "audio_path": audio_path})
+    
+    except Exception as e:
+        for item in items:
+            if item["audio_path"] is None:
+                continue
+            processing_status.pop(item["request_id"], None)
+            discard_upload(item["audio_path"])
+        if audio_path:
+            discard_upload(audio_path)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Error processing batch: {str(e)}")
     
-    # Step 3: Translate to Bengali
-    bengali_text = translate_text(solution)
+    batch_status[batch_id] = {
+        "status": "processing",
+        "items": [{"request_id": item["request_id"], "filename": item["filename"]} for item in items]
+    }
     
-    # Step 4: Convert Bengali text to speech
-    audio_files = bengali_text_to_speech(bengali_text, request_id=str(uuid.uuid4()))
+    # Items are queued individually under the caller's fair share, so a large
+    # batch cannot starve other clients
+    client_id = get_client_id(request)
+    for item in items:
+        if item["audio_path"] is None:
+            continue
+        job_scheduler.submit(process_audio_background, item["audio_path"], item["request_id"], direct_answer, None,
+                             latency_target,
+                             client_id=client_id, cost=estimate_job_cost(item["audio_path"]))
     
     return {
-        "english_text": english_text,
-        "solution": solution,
-        "bengali_text": bengali_text,
-        "audio_files": audio_files
+        "batch_id": batch_id,
+        "status": "processing",
+        "items": batch_status[batch_id]["items"]
     }
 
-def speech_to_text(audio_path: str):
-    """Convert speech to text using Sarvam API"""
-    if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
-        return ""
+@app.websocket("/ws/voice")
+async def voice_session(websocket: WebSocket):
+    """
+    Full-duplex voice session.
     
-    try:
-        # Speech to text API endpoint
-        url = "https://api.sarvam.ai/speech-to-text-translate"
-        headers = {"api-subscription-key": SARVAM_AI_API}
-        data = {"model": "saaras:v2", "with_diarization": False}
-        
-        with open(audio_path, "rb") as audio_file:
-            files = {'file': ('audiofile.wav', audio_file, 'audio/wav')}
-            response = requests.post(url, headers=headers, files=files, data=data)
-        
-        if response.status_code == 200:
-            transcript = response.json().get("transcript", "")
-            return transcript
-        else:
-            print(f"STT Error: {response.status_code}, {response.text}")
-            return ""
-    except Exception as e:
-        print(f"Error in speech to text: {e}")
-        return ""
-
-def bengali_text_to_speech(bengali_text, request_id):
-    """Convert Bengali text to speech using SarvamAI"""
-    from utils.textToSpeech import split_text_into_chunks
+    Client -> server:
+      binary frames: 16-bit mono PCM microphone audio (16 kHz unless set in "start")
+      {"type": "start", "sample_rate": 16000, "direct_answer": false, "latency_target": null}  (optional, first)
+      {"type": "end"}   the user stopped talking; endpoint now instead of waiting for silence
+      {"type": "stop"}  close the session
     
-    if not bengali_text or not bengali_text.strip():
-        return []
+    Server -> client, per utterance:
+      {"type": "transcript"}, {"type": "answer"}, {"type": "translation"} stage events,
+      then for each TTS chunk {"type": "audio", "index": n, "format": "wav"} followed by
+      one binary frame with the WAV bytes, and finally {"type": "done"} (with an "error"
+      if the turn failed, or if "end" arrived with no speech pending).
+      {"type": "error", "message"} answers a malformed control message.
+    """
+    await websocket.accept()
+    sample_rate = 16000
+    direct_answer = DIRECT_ANSWER
+    latency_target = None
+    endpointer = EnergyEndpointer(sample_rate=sample_rate)
+    utterances = asyncio.Queue()
     
-    client = SarvamAI(api_subscription_key=SARVAM_AI_API)
-    chunks = split_text_into_chunks(bengali_text, max_length=300)
+    async def respond():
+        while True:
+            pcm = await utterances.get()
+            if pcm is None:
+                return
+            try:
+                if pcm:
+                    await run_voice_turn(websocket, pcm_to_wav(pcm, sample_rate, 1, 2), direct_answer, latency_target)
+                else:
+                    await websocket.send_json({"type": "done", "error": "No speech detected"})
+            except WebSocketDisconnect:
+                return
+            except Exception as e:
+                try:
+                    await websocket.send_json({"type": "done", "error": str(e)})
+                except Exception:
+                    # The socket is gone; the receive loop sees the disconnect
+                    return
     
-    audio_files = []
+    responder = asyncio.create_task(respond())
     
-    for idx, chunk in enumerate(chunks):
-        try:
-            response = client.text_to_speech.convert(
-                text=chunk,
-                target_language_code="bn-IN",
-                speaker="anushka",
-                enable_preprocessing=True,
-            )
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
             
-            output_filename = f"responses/tts_{request_id}_{idx + 1:03d}.wav"
-            save(response, output_filename)
-            audio_files.append(output_filename)
+            if message.get("bytes"):
+                for pcm in endpointer.feed(message["bytes"]):
+                    await utterances.put(pcm)
+                continue
             
-        except Exception as e:
-            print(f"Error in TTS for chunk {idx + 1}: {e}")
+            try:
+                control = json.loads(message.get("text") or "{}")
+                if not isinstance(control, dict):
+                    raise ValueError("expected a JSON object")
+                if control.get("type") == "start":
+                    # Validate everything before applying any of it
+                    new_sample_rate = int(control.get("sample_rate", sample_rate))
+                    if new_sample_rate < 8000:
+                        raise ValueError("sample_rate must be at least 8000")
+                    new_direct_answer = control.get("direct_answer", direct_answer)
+                    if not isinstance(new_direct_answer, bool):
+                        raise ValueError("direct_answer must be true or false")
+                    new_latency_target = control.get("latency_target", latency_target)
+                    if new_latency_target is not None:
+                        new_latency_target = float(new_latency_target)
+                        if new_latency_target <= 0:
+                            raise ValueError("latency_target must be positive")
+                    endpointer = EnergyEndpointer(sample_rate=new_sample_rate)
+                    sample_rate = new_sample_rate
+                    direct_answer = new_direct_answer
+                    latency_target = new_latency_target
+            except (ValueError, TypeError) as e:
+                await websocket.send_json({"type": "error", "message": f"Invalid control message: {e}"})
+                continue
+            
+            if control.get("type") == "end":
+                # An empty utterance tells the responder to answer "no speech", in order
+                await utterances.put(endpointer.flush() or b"")
+            elif control.get("type") == "stop":
+                break
+        
+        # Finish answering queued utterances before closing
+        await utterances.put(None)
+        await responder
+        await websocket.close()
     
-    return audio_files
+    except WebSocketDisconnect:
+        pass
+    finally:
+        responder.cancel()
+
+async def run_voice_turn(websocket: WebSocket, wav_bytes: bytes, direct_answer: bool, latency_target: float = None):
+    """Run one utterance through the engine, pushing each stage's result to the socket"""
+    async for event in engine.run(wav_bytes, direct_answer=direct_answer, latency_target=latency_target, merge=False):
+        if event["type"] == "audio":
+            await send_audio_chunk(websocket, event["index"], event["file"])
+        elif event["type"] == "done":
+            error = event["result"].get("error")
+            await websocket.send_json({"type": "done", "error": error} if error else {"type": "done"})
+        else:
+            await websocket.send_json(event)
+
+async def send_audio_chunk(websocket: WebSocket, index: int, audio_file: str):
+    """Send an audio chunk header event followed by the WAV bytes"""
+    with open(audio_file, "rb") as f:
+        data = f.read()
+    await websocket.send_json({"type": "audio", "index": index, "format": "wav", "file": os.path.basename(audio_file)})
+    await websocket.send_bytes(data)
+
+@app.get("/debug/profile")
+async def debug_profile(request: Request, seconds: float = 10, allocations: bool = False):
+    """
+    Sample every thread of the running service for the given number of seconds.
+    Returns collapsed stacks (text/plain, one "frame;frame;... count" line per stack)
+    ready for flamegraph.pl or speedscope; with allocations=true returns JSON with the
+    stacks and the top allocation sites traced during the window.
+    """
+    token = request.headers.get("x-debug-token", "")
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not hmac.compare_digest(token.encode("utf-8"), DEBUG_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+    
+    try:
+        # Sampled from a worker thread so the event loop keeps serving (and shows up in the stacks)
+        result = await run_in_threadpool(profile, seconds, allocations)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if allocations:
+        return result
+    return Response(content=result["collapsed"], media_type="text/plain")
+
+def status_etag(request_id: str, version: int):
+    return f'"{request_id}-{version}"'
 
 @app.get("/status/{request_id}")
-async def get_status(request_id: str):
-    """Get the status of an audio processing request"""
-    if request_id not in processing_status:
+async def get_status(request_id: str, request: Request, wait: float = 0):
+    """
+    Get the status of an audio processing request.
+    
+    With ?wait=N the request is held for up to N seconds until the status changes
+    from the version the client already has (its If-None-Match ETag, or the current
+    version of a job still processing if none is sent). A client holding an older
+    version gets the current one immediately. An unchanged status is answered with 304.
+    """
+    version = processing_status.version(request_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Request ID not found")
     
-    return processing_status[request_id]
+    if_none_match = request.headers.get("if-none-match")
+    client_is_current = bool(if_none_match) and etag_matches(if_none_match, status_etag(request_id, version))
+    
+    if if_none_match:
+        should_wait = client_is_current
+    else:
+        should_wait = processing_status.get(request_id, {}).get("status") == "processing"
+    
+    if wait > 0 and should_wait:
+        await processing_status.wait_for_change(request_id, version, min(wait, MAX_STATUS_WAIT))
+    
+    snapshot = processing_status.snapshot(request_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Request ID not found")
+    
+    version, _, body = snapshot
+    etag = status_etag(request_id, version)
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/batch-status/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Get the status of a batch and each of its items"""
+    if batch_id not in batch_status:
+        raise HTTPException(status_code=404, detail="Batch ID not found")
+    
+    batch = batch_status[batch_id]
+    items = []
+    for item in batch["items"]:
+        status = processing_status.get(item["request_id"], {})
+        items.append({**item, **status})
+    
+    if all(item.get("status") in ("completed", "error") for item in items):
+        batch["status"] = "completed"
+    
+    return {"batch_id": batch_id, "status": batch["status"], "items": items}
+
+def negotiate_audio_format(accept: str):
+    """Pick a format from an Accept header; WAV unless a compressed format is explicitly preferred"""
+    best, best_q = "wav", 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        
+        media_type = media_type.strip().lower()
+        for fmt, info in AUDIO_FORMATS.items():
+            if media_type in info["accept"] and q > best_q:
+                best, best_q = fmt, q
+    return best
+
+def get_encoded_audio(wav_path: str, fmt: str):
+    """Return the path of wav_path encoded as fmt, encoding it on first request"""
+    target_path = f"{os.path.splitext(wav_path)[0]}.{fmt}"
+    if os.path.exists(target_path) and os.path.getmtime(target_path) >= os.path.getmtime(wav_path):
+        return target_path
+    
+    return encode_flight.do(target_path, encode_audio, wav_path, target_path, fmt)
 
 @app.get("/audio/{filename}")
-async def get_audio_file(filename: str):
-    """Get an audio file by filename"""
-    file_path = f"responses/{filename}"
+async def get_audio_file(filename: str, request: Request, format: str = None):
+    """
+    Get an audio file by filename.
+    WAV files can be served as Opus/OGG or MP3, chosen with ?format=ogg|mp3|wav
+    or the Accept header.
+    """
+    file_path = resolve_path("responses", filename)
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Audio file not found")
     
-    return FileResponse(file_path, media_type="audio/wav")
+    fmt = (format or negotiate_audio_format(request.headers.get("accept", ""))).lower()
+    if fmt not in AUDIO_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported audio format: {fmt}")
+    
+    if fmt != "wav" and file_path.endswith(".wav"):
+        try:
+            file_path = await run_in_threadpool(get_encoded_audio, file_path, fmt)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error encoding audio: {str(e)}")
+    
+    media_type = AUDIO_FORMATS.get(os.path.splitext(file_path)[1].lstrip("."), AUDIO_FORMATS["wav"])["media_type"]
+    return audio_file_response(request, file_path, media_type)
+
+def file_etag(stat_result):
+    """Strong validator built from a file's modification time and size"""
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+def etag_matches(header: str, etag: str):
+    """Check an If-None-Match header value against an ETag"""
+    if header.strip() == "*":
+        return True
+    candidates = [value.strip() for value in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+def parse_range(header: str, size: int):
+    """
+    Parse a single-range Range header.
+    Returns (start, end) inclusive, None to serve the whole file, or False if unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    
+    start, _, end = spec.strip().partition("-")
+    try:
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0:
+                return False
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    
+    if start >= size or start > end:
+        return False
+    return start, end
+
+def iter_file_range(file_path: str, start: int, end: int):
+    """Yield bytes start..end (inclusive) of a file in blocks"""
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = f.read(min(FILE_READ_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+def audio_file_response(request: Request, file_path: str, media_type: str):
+    """Serve a file with ETag/If-None-Match revalidation and single byte-range requests"""
+    stat_result = os.stat(file_path)
+    etag = file_etag(stat_result)
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Vary": "Accept"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range(range_header, stat_result.st_size)
+        if byte_range is False:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stat_result.st_size}"})
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(iter_file_range(file_path, start, end), status_code=206,
+                                     media_type=media_type, headers=headers)
+    
+    return FileResponse(file_path, media_type=media_type, headers=headers, stat_result=stat_result)
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))  # Use PORT from .env or default to 8000
+    reload = os.environ.get("RELOAD", "false").lower() == "true"  # Auto-reload for development only
     print(f"Starting server on port {port}")
-    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=True)
+    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=reload)
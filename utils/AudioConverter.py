@@ -4,6 +4,8 @@ import numpy as np
 import os
 import time
 import threading
+from utils.echoGate import is_playback_active
+from utils.recordingState import begin_recording, end_recording
 
 # Configuration
 FORMAT = pyaudio.paInt16
@@ -41,10 +43,29 @@ def continuous_recording():
     file_counter = 0
     silent_chunks = 0
     recording_started = False
+    gated = False
     
     try:
         while True:
             data = stream.read(CHUNK)
+            
+            # Drop capture while our own answer is playing (plus a short tail), so the
+            # speakers' output never becomes a new utterance
+            if is_playback_active():
+                if not gated:
+                    gated = True
+                    print("Playback in progress, ignoring microphone...")
+                if recording_started:
+                    end_recording()
+                frames = []
+                chunk_counter = 0
+                silent_chunks = 0
+                recording_started = False
+                continue
+            if gated:
+                gated = False
+                print("Playback finished, listening again...")
+            
             audio_data = np.frombuffer(data, dtype=np.int16)
             amplitude = np.abs(audio_data).mean()
             
@@ -52,6 +73,8 @@ def continuous_recording():
             if amplitude > THRESHOLD:
                 if not recording_started:
                     recording_started = True
+                    # Lets the pipeline wait for this utterance before answering the previous one
+                    begin_recording()
                     print("Sound detected, starting recording...")
                 frames.append(data)
                 silent_chunks = 0
@@ -73,6 +96,7 @@ def continuous_recording():
                     
                     if save_chunk(frames, filename):
                         file_counter += 1
+                end_recording()
                 
                 # Reset for next recording
                 frames = []
@@ -95,6 +119,8 @@ def continuous_recording():
             timestamp = int(time.time())
             filename = f"{OUTPUT_DIR}/chunk_{timestamp}_{file_counter}_final.wav"
             save_chunk(frames, filename)
+        if recording_started:
+            end_recording()
 
 def start_recording():
     """Initialize and start the recording process"""
@@ -1,44 +1,232 @@
-import google.generativeai as genai
+import math
 import os
 from dotenv import load_dotenv
+from utils.clients import get_gemini_model
+from utils.singleflight import SingleFlight, normalize_text
+from utils.chunkPlanner import SENTENCE_ENDS, split_sentences
+from utils.autotune import STAGES, get_latency_fit
 
 load_dotenv()
 
-# Configure the Gemini API
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+# Language names used when asking the model to answer directly in the target language,
+# with the Unicode block used to validate that the answer is really in that script
+LANGUAGES = {
+    "bn-IN": {"name": "Bengali", "script_range": ("\u0980", "\u09ff")},
+}
 
-def findsolution(text):
-    """Generate responses about Bengali culture using Google's Gemini model"""
-    try:
-        # Configure the model
-        generation_config = {
-            "temperature": 0.7,
-            "top_p": 0.95,
-            "top_k": 64,
-            "max_output_tokens": 1024,
-        }
-        
-        # Initialize Gemini model
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash",
-            generation_config=generation_config
+# Minimum share of letters that must be in the target script for a direct answer to be accepted
+MIN_SCRIPT_RATIO = 0.6
+
+# Spoken length of an answer when the request sets no budget, in seconds
+ANSWER_SECONDS = float(os.environ.get("ANSWER_SECONDS", 30))
+# Speaking rate of the TTS voice, in characters per second of audio
+SPEECH_CHARS_PER_SECOND = 14
+# Bounds on the answer length a budget may ask for, in characters
+MIN_ANSWER_CHARS = 80
+MAX_ANSWER_CHARS = 3000
+# Approximate characters per Gemini output token, by answer script, and the
+# headroom added so the model can finish its last sentence
+CHARS_PER_TOKEN = {"en": 4.0, "bn": 2.0}
+TOKEN_HEADROOM = 1.3
+# Output tokens reserved for the model's thinking, which gemini-2.5 models count
+# against max_output_tokens before any answer text is produced
+THINKING_TOKENS = int(os.environ.get("GEMINI_THINKING_TOKENS", 2048))
+# Gemini latency model used to turn a latency target into an answer length
+GEMINI_OVERHEAD = float(os.environ.get("GEMINI_OVERHEAD", 0.8))
+GEMINI_TOKENS_PER_SECOND = float(os.environ.get("GEMINI_TOKENS_PER_SECOND", 60))
+
+# Concurrent identical questions share one Gemini call
+_llm_flight = SingleFlight()
+
+def answer_budget(seconds=None, max_chars=None):
+    """
+    Response budget for one answer
+
+    Args:
+        seconds: Target spoken duration of the answer (default ANSWER_SECONDS)
+        max_chars: Target length in characters; overrides seconds
+
+    Returns:
+        {"max_chars"}, the character limit used for the prompt and generation limits
+    """
+    if max_chars is None:
+        max_chars = (seconds or ANSWER_SECONDS) * SPEECH_CHARS_PER_SECOND
+    return {"max_chars": int(min(max(max_chars, MIN_ANSWER_CHARS), MAX_ANSWER_CHARS))}
+
+def budget_for_latency(latency_seconds, translated=True):
+    """
+    Longest answer that can be generated, translated and synthesized within latency_seconds
+
+    Uses the Gemini latency model above and the translate/TTS latency fits
+    from utils.autotune (time from transcript to the last audio chunk).
+    """
+    tts_overhead, tts_per_char = get_latency_fit("tts_chunk_chars")
+    script = "en" if translated else "bn"
+
+    overhead = GEMINI_OVERHEAD + tts_overhead
+    per_char = 1 / (CHARS_PER_TOKEN[script] * GEMINI_TOKENS_PER_SECOND)
+    per_char += tts_per_char / max(STAGES["tts_chunk_chars"]["concurrency"], 1)
+    if translated:
+        translate_overhead, translate_per_char = get_latency_fit("translate_chunk_chars")
+        overhead += translate_overhead
+        per_char += translate_per_char
+
+    return answer_budget(max_chars=(latency_seconds - overhead) / per_char)
+
+def max_output_tokens(budget, script="en"):
+    """Generation limit for a budget: enough tokens for max_chars plus headroom and thinking"""
+    return math.ceil(budget["max_chars"] / CHARS_PER_TOKEN[script] * TOKEN_HEADROOM) + THINKING_TOKENS
+
+def build_prompt(text, language_name=None, max_chars=None):
+    """Build the Gemini prompt, optionally asking for the answer in another language and within a length"""
+    language_instruction = ""
+    if language_name:
+        language_instruction = (
+            f"Answer only in {language_name}, written in {language_name} script. "
+            f"Do not include an English translation."
+        )
+    if max_chars:
+        language_instruction = language_instruction + " " if language_instruction else ""
+        language_instruction += (
+            f"The answer will be read aloud: keep it under {max_chars} characters "
+            f"(about {max(max_chars // 100, 1)} short sentences), in plain sentences without lists or markdown."
         )
-        
-        # Create prompt with system and user content
-        prompt = f"""
+
+    return f"""
         System: You are a knowledgeable assistant specializing in Bengali culture, heritage, literature, and traditions.
-        Please provide informative and engaging responses about Bengali history, arts, cuisine, festivals, language, 
+        Please provide informative and engaging responses about Bengali history, arts, cuisine, festivals, language,
         or any cultural aspects. Ensure your responses are respectful, authentic, and celebrate the rich Bengali heritage.
-        Keep responses clear, engaging, short, and to the point.
-        
+        Keep responses clear, engaging, short, and to the point. {language_instruction}
+
         User: {text}
         """
-        
-        # Generate response
-        response = model.generate_content(prompt)
-        
-        # Return the response text
-        return response.text
+
+def response_text(response):
+    """
+    Answer text of a Gemini response and whether it stopped at the token limit
+
+    Reads the parts of the first candidate instead of response.text, which raises
+    when a reply has no parts (e.g. the limit was spent on thinking). Returns ""
+    for an empty or blocked reply.
+    """
+    if not response.candidates:
+        return "", False
+
+    candidate = response.candidates[0]
+    finish_reason = getattr(candidate.finish_reason, "name", candidate.finish_reason)
+    parts = candidate.content.parts if candidate.content else []
+    text = "".join(part.text for part in parts if getattr(part, "text", None))
+    return text, finish_reason in ("MAX_TOKENS", 2)
+
+def generate(prompt, max_output_tokens=1024 + THINKING_TOKENS):
+    """Send a prompt to Gemini; returns (response text, whether it stopped at the token limit)"""
+    # Configure the model
+    generation_config = {
+        "temperature": 0.7,
+        "top_p": 0.95,
+        "top_k": 64,
+        "max_output_tokens": max_output_tokens,
+    }
+
+    # Shared Gemini model handle, configured on first use
+    model = get_gemini_model()
+
+    # Generate response
+    response = model.generate_content(prompt, generation_config=generation_config)
+
+    # Return the response text
+    return response_text(response)
+
+def fit_to_budget(answer, max_chars, hit_limit=False):
+    """
+    Trim an answer to whole sentences within max_chars
+
+    An answer cut off by the token limit also loses its unfinished last sentence.
+    Returns (answer, truncated).
+    """
+    sentences = list(split_sentences(answer))
+    if hit_limit and len(sentences) > 1 and sentences[-1][-1] not in SENTENCE_ENDS:
+        sentences.pop()
+
+    kept = []
+    length = 0
+    for sentence in sentences:
+        added = len(sentence) + (1 if kept else 0)
+        if kept and length + added > max_chars:
+            break
+        kept.append(sentence)
+        length += added
+
+    truncated = hit_limit or len(kept) < len(sentences)
+    return (" ".join(kept) if truncated else answer), truncated
+
+def _answer(text, language_name, budget, script, info):
+    """Generate an answer within budget, sharing the call with identical concurrent questions"""
+    budget = budget or answer_budget()
+    prompt = build_prompt(text, language_name, budget["max_chars"])
+    key = (script, budget["max_chars"], normalize_text(text, casefold=True))
+    answer, hit_limit = _llm_flight.do(key, generate, prompt, max_output_tokens(budget, script))
+    if not answer.strip():
+        print("Gemini returned an empty answer" + (" (token limit reached)" if hit_limit else ""))
+        return ""
+    answer, truncated = fit_to_budget(answer, budget["max_chars"], hit_limit)
+
+    if info is not None:
+        info.update({"max_chars": budget["max_chars"], "truncated": truncated})
+    if truncated:
+        print(f"Answer truncated to the {budget['max_chars']} character budget")
+    return answer
+
+def is_in_script(text, target_lang):
+    """Check that most letters of text are written in the script of target_lang"""
+    low, high = LANGUAGES[target_lang]["script_range"]
+    letters = [ch for ch in text if ch.isalpha()]
+    if not letters:
+        return False
+
+    in_script = sum(1 for ch in letters if low <= ch <= high)
+    return in_script / len(letters) >= MIN_SCRIPT_RATIO
+
+def findsolution(text, budget=None, info=None):
+    """
+    Generate responses about Bengali culture using Google's Gemini model
+
+    Args:
+        text: User question
+        budget: Response budget from answer_budget() or budget_for_latency() (default answer_budget())
+        info: Optional dict that receives the applied "max_chars" and whether the answer was "truncated"
+    """
+    try:
+        return _answer(text, None, budget, "en", info)
     except Exception as e:
         print(f"Error in Gemini API call: {e}")
-        return f"Sorry, I couldn't process your request due to an error: {str(e)}"
\ No newline at end of file
+        return f"Sorry, I couldn't process your request due to an error: {str(e)}"
+
+def findsolution_direct(text, target_lang="bn-IN", budget=None, info=None):
+    """
+    Generate the answer directly in the target language, skipping the translate step
+
+    Args:
+        text: User question (English transcript)
+        target_lang: Language code the answer should be written in
+        budget: Response budget, as for findsolution
+        info: Optional dict filled as for findsolution
+
+    Returns:
+        Answer text, or None if the call failed or the answer was not in the
+        target language (callers should fall back to findsolution + translate)
+    """
+    if target_lang not in LANGUAGES:
+        return None
+
+    try:
+        answer = _answer(text, LANGUAGES[target_lang]["name"], budget, target_lang.split("-")[0], info)
+    except Exception as e:
+        print(f"Error in Gemini API call (direct {target_lang}): {e}")
+        return None
+
+    if not answer or not answer.strip() or not is_in_script(answer, target_lang):
+        print(f"Direct {target_lang} answer failed validation, falling back to translation")
+        return None
+
+    return answer
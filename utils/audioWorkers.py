@@ -0,0 +1,171 @@
+import io
+import os
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+
+# CPU-bound audio work (decode, resample) runs in worker processes so it does not
+# hold the GIL on the threads that handle HTTP and API I/O
+AUDIO_WORKERS = int(os.environ.get("AUDIO_WORKERS", os.cpu_count() or 2))
+
+# Format the STT API works best with; decoding straight to it also shrinks uploads
+STT_FRAME_RATE = 16000
+STT_CHANNELS = 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_audio_pool():
+    """Return the process pool used for audio decoding and encoding"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=AUDIO_WORKERS)
+    return _pool
+
+def shutdown_audio_pool():
+    """Stop the audio worker processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _warm_worker():
+    """Import the decoding stack in a worker process"""
+    import pydub
+    return os.getpid()
+
+def warm_audio_pool():
+    """Start every audio worker process and preload pydub in it"""
+    pool = get_audio_pool()
+    futures = [pool.submit(_warm_worker) for _ in range(AUDIO_WORKERS)]
+    return {future.result() for future in futures}
+
+def run_in_audio_pool(fn, *args):
+    """Run fn in the audio process pool, falling back to the calling thread if the pool is unusable"""
+    try:
+        return get_audio_pool().submit(fn, *args).result()
+    except BrokenProcessPool as e:
+        print(f"❌ Audio worker pool broken, decoding in-process: {e}")
+        shutdown_audio_pool()
+        return fn(*args)
+
+class PCMBuffer:
+    """Raw PCM audio held in a shared memory block written by an audio worker process"""
+
+    def __init__(self, name, nbytes, frame_rate, channels, sample_width):
+        self.nbytes = nbytes
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self._shm = shared_memory.SharedMemory(name=name)
+
+    @property
+    def frame_size(self):
+        return self.channels * self.sample_width
+
+    @property
+    def duration_ms(self):
+        return self.nbytes * 1000 // (self.frame_rate * self.frame_size)
+
+    def view(self, start_ms=0, end_ms=None):
+        """Zero-copy view of the PCM bytes between start_ms and end_ms"""
+        start = self._offset(start_ms)
+        end = self.nbytes if end_ms is None else min(self._offset(end_ms), self.nbytes)
+        return self._shm.buf[start:end]
+
+    def wav_segments(self, chunk_duration_ms):
+        """Yield WAV-encoded segments of at most chunk_duration_ms each"""
+        for start_ms in range(0, max(self.duration_ms, 1), chunk_duration_ms):
+            segment = self.view(start_ms, start_ms + chunk_duration_ms)
+            try:
+                yield pcm_to_wav(segment, self.frame_rate, self.channels, self.sample_width)
+            finally:
+                segment.release()
+
+    def release(self):
+        """Detach from and free the shared memory block"""
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _offset(self, ms):
+        return (self.frame_rate * ms // 1000) * self.frame_size
+
+def pcm_to_wav(pcm, frame_rate, channels, sample_width):
+    """Wrap raw PCM bytes in a WAV header"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(frame_rate)
+        wf.writeframes(pcm)
+    return buffer.getvalue()
+
+def _decode_to_shared_memory(audio_path, frame_rate, channels):
+    """Decode and resample an audio file into a new shared memory block (runs in a worker process)"""
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(audio_path)
+    if frame_rate:
+        audio = audio.set_frame_rate(frame_rate)
+    if channels:
+        audio = audio.set_channels(channels)
+
+    raw = audio.raw_data
+    shm = shared_memory.SharedMemory(create=True, size=max(len(raw), 1))
+    try:
+        shm.buf[:len(raw)] = raw
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+
+    # The parent's PCMBuffer owns the block from here and unlinks it in release();
+    # stop tracking it in this process so the resource tracker does not count the
+    # block twice and report it as leaked
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm.name, len(raw), audio.frame_rate, audio.channels, audio.sample_width
+
+def decode_audio(audio_path, frame_rate=STT_FRAME_RATE, channels=STT_CHANNELS):
+    """
+    Decode an audio file to PCM on the audio process pool
+
+    Args:
+        audio_path: Path of any format pydub/ffmpeg can read
+        frame_rate: Resample to this rate (None keeps the original)
+        channels: Mix to this many channels (None keeps the original)
+
+    Returns:
+        PCMBuffer backed by shared memory; call release() when done
+    """
+    return PCMBuffer(*run_in_audio_pool(_decode_to_shared_memory, audio_path, frame_rate, channels))
+
+# Output formats for compressed responses: pydub export format, codec and bitrate
+ENCODINGS = {
+    "ogg": {"format": "ogg", "codec": "libopus", "bitrate": "24k"},
+    "mp3": {"format": "mp3", "codec": None, "bitrate": "48k"},
+}
+
+def _encode_file(source_path, target_path, fmt):
+    """Encode an audio file to a compressed format (runs in a worker process)"""
+    from pydub import AudioSegment
+    options = ENCODINGS[fmt]
+    audio = AudioSegment.from_file(source_path)
+
+    # Write next to the target and rename so readers never see a partial file
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    audio.export(tmp_path, format=options["format"], codec=options["codec"], bitrate=options["bitrate"])
+    os.replace(tmp_path, target_path)
+    return target_path
+
+def encode_audio(source_path, target_path, fmt):
+    """Encode source_path to fmt ("ogg" or "mp3") at target_path on the audio process pool"""
+    return run_in_audio_pool(_encode_file, source_path, target_path, fmt)
@@ -0,0 +1,236 @@
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import wave
+
+# Where tuned chunk sizes are stored and loaded from
+CHUNK_TUNING_PATH = os.environ.get("CHUNK_TUNING_PATH", "chunk_tuning.json")
+
+# Sizes used until a tuning run has been saved
+DEFAULT_CHUNK_SIZES = {
+    "stt_chunk_ms": 30 * 1000,
+    "translate_chunk_chars": 1000,
+    "tts_chunk_chars": 300,
+}
+
+# Per stage: the API's hard limit, the sizes tried, a typical amount of work per
+# request (ms of audio or characters) and the concurrency the runtime uses for it
+STAGES = {
+    "stt_chunk_ms": {
+        "limit": 30 * 1000,
+        "candidates": [5000, 10000, 15000, 20000, 25000, 30000],
+        "workload": int(os.environ.get("TUNE_STT_WORKLOAD_MS", 60 * 1000)),
+        "concurrency": int(os.environ.get("STT_STREAM_WORKERS", 4)),
+    },
+    "translate_chunk_chars": {
+        "limit": 1000,
+        "candidates": [200, 400, 600, 800, 1000],
+        "workload": int(os.environ.get("TUNE_TRANSLATE_WORKLOAD_CHARS", 1500)),
+        "concurrency": 1,
+    },
+    "tts_chunk_chars": {
+        "limit": 500,
+        "candidates": [100, 200, 300, 400, 500],
+        "workload": int(os.environ.get("TUNE_TTS_WORKLOAD_CHARS", 1200)),
+        "concurrency": int(os.environ.get("TTS_STREAM_WORKERS", 3)),
+    },
+}
+
+# Latency model used by simulated runs: seconds = overhead + per_unit * size (+ jitter)
+SIMULATED_LATENCY = {
+    "stt_chunk_ms": (0.6, 0.00004),
+    "translate_chunk_chars": (0.4, 0.0008),
+    "tts_chunk_chars": (0.5, 0.003),
+}
+
+SAMPLE_ENGLISH = (
+    "Durga Puja is the biggest festival of Bengal. Families visit pandals across the city, "
+    "share food and music, and celebrate the victory of the goddess over evil. "
+)
+SAMPLE_BENGALI = (
+    "দুর্গাপূজা বাংলার সবচেয়ে বড় উৎসব। পরিবারগুলি শহর জুড়ে প্যান্ডেল দেখতে যায়, "
+    "খাবার আর গান ভাগ করে নেয় এবং অশুভের উপর দেবীর জয় উদযাপন করে। "
+)
+
+def _repeat_to(text, length):
+    return (text * (length // len(text) + 1))[:length]
+
+def _measure_live(stage, size, audio_path=None):
+    """Time one real API call for a chunk of the given size"""
+    if stage == "stt_chunk_ms":
+        from utils.audioWorkers import pcm_to_wav
+        from utils.engine import transcribe_segment
+
+        with wave.open(audio_path, "rb") as wf:
+            params = (wf.getframerate(), wf.getnchannels(), wf.getsampwidth())
+            pcm = wf.readframes(wf.getnframes())
+        frame_rate, channels, sample_width = params
+        wanted = frame_rate * size // 1000 * channels * sample_width
+        chunk = pcm_to_wav(_repeat_to(pcm, wanted), frame_rate, channels, sample_width)
+
+        start_time = time.time()
+        transcribe_segment(chunk)
+        return time.time() - start_time
+
+    if stage == "translate_chunk_chars":
+        from utils.translate import translate_chunk
+
+        # One API call of exactly this size, independent of the currently tuned chunk size
+        start_time = time.time()
+        translate_chunk(_repeat_to(SAMPLE_ENGLISH, size), "en-IN", "bn-IN", "formal")
+        return time.time() - start_time
+
+    from utils.clients import get_sarvam_client
+
+    start_time = time.time()
+    get_sarvam_client().text_to_speech.convert(
+        text=_repeat_to(SAMPLE_BENGALI, size),
+        target_language_code="bn-IN",
+        speaker="anushka",
+        enable_preprocessing=True,
+    )
+    return time.time() - start_time
+
+def _measure_simulated(stage, size):
+    overhead, per_unit = SIMULATED_LATENCY[stage]
+    return max(overhead + per_unit * size + random.gauss(0, overhead * 0.1), 0.0)
+
+def measure_stage(stage, simulated=False, repeats=3, audio_path=None):
+    """
+    Measure call latency for every candidate size of a stage
+
+    Returns:
+        List of (size, seconds) samples
+    """
+    samples = []
+    for size in STAGES[stage]["candidates"]:
+        for _ in range(repeats):
+            try:
+                if simulated:
+                    seconds = _measure_simulated(stage, size)
+                else:
+                    seconds = _measure_live(stage, size, audio_path)
+            except Exception as e:
+                print(f"❌ Measurement failed for {stage}={size}: {e}")
+                continue
+            samples.append((size, seconds))
+        print(f"⏱️ {stage}={size}: {[round(s, 3) for z, s in samples if z == size]}")
+    return samples
+
+def fit_latency(samples):
+    """Least-squares fit of seconds = overhead + per_unit * size; returns (overhead, per_unit)"""
+    import numpy as np
+
+    sizes = np.array([size for size, _ in samples], dtype=float)
+    seconds = np.array([s for _, s in samples], dtype=float)
+    if len(set(sizes)) < 2:
+        return float(seconds.mean()), 0.0
+    per_unit, overhead = np.polyfit(sizes, seconds, 1)
+    return max(float(overhead), 0.0), max(float(per_unit), 0.0)
+
+def predicted_latency(size, overhead, per_unit, workload, concurrency):
+    """End-to-end seconds to process workload in chunks of size with concurrency calls in flight"""
+    calls = math.ceil(workload / size)
+    rounds = math.ceil(calls / max(concurrency, 1))
+    return rounds * (overhead + per_unit * size)
+
+def choose_size(stage, overhead, per_unit):
+    """Candidate size with the lowest predicted end-to-end latency (larger, i.e. fewer calls, on ties)"""
+    config = STAGES[stage]
+    candidates = [size for size in config["candidates"] if size <= config["limit"]]
+    return min(candidates, key=lambda size: (
+        round(predicted_latency(size, overhead, per_unit, config["workload"], config["concurrency"]), 3),
+        -size,
+    ))
+
+def tune(stages=None, simulated=False, repeats=3, audio_path=None, output_path=CHUNK_TUNING_PATH):
+    """
+    Measure, fit and choose chunk sizes, then save them for the runtime
+
+    Args:
+        stages: Stage names to tune (default: all of STAGES)
+        simulated: Use the SIMULATED_LATENCY model instead of calling the APIs
+        repeats: Calls per candidate size
+        audio_path: Speech WAV file used to measure STT (required for live STT tuning)
+        output_path: JSON file the chosen sizes are written to
+
+    Returns:
+        The saved tuning dict
+    """
+    stages = stages or list(STAGES)
+    tuning = load_tuning(output_path) or {}
+    chosen = dict(tuning.get("chunk_sizes", {}))
+    fits = dict(tuning.get("fits", {}))
+
+    for stage in stages:
+        if stage == "stt_chunk_ms" and not simulated and not audio_path:
+            print("⚠️ Skipping STT: pass --audio with a speech recording to tune it live")
+            continue
+
+        samples = measure_stage(stage, simulated, repeats, audio_path)
+        if not samples:
+            continue
+
+        overhead, per_unit = fit_latency(samples)
+        chosen[stage] = choose_size(stage, overhead, per_unit)
+        fits[stage] = {"overhead": round(overhead, 4), "per_unit": per_unit, "samples": len(samples),
+                       "concurrency": STAGES[stage]["concurrency"], "workload": STAGES[stage]["workload"]}
+        print(f"✅ {stage}: {chosen[stage]} (overhead {overhead:.3f}s, {per_unit * 1000:.4f}s per 1000)")
+
+    tuning = {"chunk_sizes": chosen, "fits": fits, "simulated": simulated, "tuned_at": int(time.time())}
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(tuning, f, indent=2)
+    print(f"💾 Chunk sizes written to {output_path}")
+
+    global _tuning
+    _tuning = None
+    return tuning
+
+def load_tuning(path=CHUNK_TUNING_PATH):
+    """Read a saved tuning file, or None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading chunk tuning: {e}")
+        return None
+
+_tuning = None
+_tuning_lock = threading.Lock()
+
+def _get_tuning():
+    global _tuning
+    if _tuning is None:
+        with _tuning_lock:
+            if _tuning is None:
+                _tuning = load_tuning() or {}
+    return _tuning
+
+def get_chunk_size(name):
+    """Tuned chunk size for name (see DEFAULT_CHUNK_SIZES), clamped to the API limit"""
+    sizes = {**DEFAULT_CHUNK_SIZES, **_get_tuning().get("chunk_sizes", {})}
+    return min(int(sizes[name]), STAGES[name]["limit"])
+
+def get_latency_fit(name):
+    """(overhead, per_unit) latency model of a stage from the last tuning run, else the built-in model"""
+    fit = _get_tuning().get("fits", {}).get(name)
+    if fit:
+        return fit["overhead"], fit["per_unit"]
+    return SIMULATED_LATENCY[name]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune STT, translate and TTS chunk sizes")
+    parser.add_argument("--stage", action="append", choices=list(STAGES), help="Stage to tune (repeatable; default all)")
+    parser.add_argument("--simulate", action="store_true", help="Use the built-in latency model instead of the APIs")
+    parser.add_argument("--audio", help="Speech WAV used to measure STT")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=CHUNK_TUNING_PATH)
+    args = parser.parse_args()
+
+    tune(args.stage, args.simulate, args.repeats, args.audio, args.output)
@@ -0,0 +1,89 @@
+# Characters that end a sentence: Bengali danda and double danda, and English terminators
+SENTENCE_ENDS = "।॥.!?"
+# Closing quotes and brackets that stay with the sentence they end
+CLOSERS = "\"')]”’"
+# Terminators that end a sentence even without following whitespace
+ALWAYS_ENDS = "।॥"
+
+def split_sentences(text):
+    """
+    Yield the sentences of text in one pass, keeping their punctuation
+
+    A sentence ends at a danda, at ".", "!" or "?" followed by whitespace or the
+    end of the text (so "3.5" and "e.g.x" stay whole), or at a line break.
+    """
+    start = 0
+    i = 0
+    length = len(text)
+
+    while i < length:
+        char = text[i]
+        if char in SENTENCE_ENDS or char == "\n":
+            end = i + 1
+            while end < length and (text[end] in SENTENCE_ENDS or text[end] in CLOSERS):
+                end += 1
+            if char == "\n" or char in ALWAYS_ENDS or end == length or text[end].isspace():
+                sentence = text[start:end].strip()
+                if sentence:
+                    yield sentence
+                start = end
+                i = end
+                continue
+        i += 1
+
+    tail = text[start:].strip()
+    if tail:
+        yield tail
+
+def _split_long(sentence, max_length):
+    """Break a sentence longer than max_length into words, hard-splitting words that are too long"""
+    for word in sentence.split():
+        for offset in range(0, len(word), max_length):
+            yield word[offset:offset + max_length]
+
+def plan_chunks(text, max_length):
+    """
+    Pack text into as few chunks of at most max_length characters as possible
+
+    Sentences are kept whole and in order with their punctuation; a chunk is
+    only closed when the next sentence does not fit. Sentences longer than
+    max_length are split at word boundaries, filling the current chunk first.
+    Runs in time linear in the length of text.
+
+    Args:
+        text: Text to split (Bengali or English)
+        max_length: Largest chunk the target API accepts, in characters
+
+    Returns:
+        List of chunks; empty for blank text
+    """
+    if not text or not text.strip():
+        return []
+    if max_length <= 0:
+        raise ValueError("max_length must be positive")
+
+    chunks = []
+    current = []
+    current_length = 0
+
+    def add(piece):
+        nonlocal current, current_length
+        added = len(piece) + (1 if current else 0)
+        if current and current_length + added > max_length:
+            chunks.append(" ".join(current))
+            current = []
+            current_length = 0
+            added = len(piece)
+        current.append(piece)
+        current_length += added
+
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_length:
+            add(sentence)
+        else:
+            for piece in _split_long(sentence, max_length):
+                add(piece)
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
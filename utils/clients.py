@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+import dotenv
+import requests
+from requests.adapters import HTTPAdapter
+
+dotenv.load_dotenv()
+SARVAM_AI_API = os.environ.get("SARVAM_AI_API")
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+
+# Connection pool sizing shared by every job in the process
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 16))
+
+# Hosts to open TLS connections to during warmup
+WARMUP_URLS = ["https://api.sarvam.ai"]
+
+_lock = threading.Lock()
+_http_session = None
+_sarvam_client = None
+_gemini_model = None
+
+def get_http_session():
+    """Return the process-wide requests session so API calls reuse pooled connections"""
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+def get_sarvam_client():
+    """Return the process-wide SarvamAI client (the SDK is imported on first use)"""
+    global _sarvam_client
+    if _sarvam_client is None:
+        with _lock:
+            if _sarvam_client is None:
+                from sarvamai import SarvamAI
+                _sarvam_client = SarvamAI(api_subscription_key=SARVAM_AI_API)
+    return _sarvam_client
+
+def get_gemini_model():
+    """Return the process-wide Gemini model handle (the SDK is imported and configured on first use)"""
+    global _gemini_model
+    if _gemini_model is None:
+        with _lock:
+            if _gemini_model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _gemini_model = genai.GenerativeModel(model_name=GEMINI_MODEL)
+    return _gemini_model
+
+def warmup(audio_pool=True):
+    """
+    Load SDKs, create clients and open upstream connections ahead of the first request
+
+    Args:
+        audio_pool: Also start the audio decoding worker processes
+    """
+    start_time = time.time()
+    session = get_http_session()
+    get_sarvam_client()
+    get_gemini_model()
+
+    for url in WARMUP_URLS:
+        try:
+            session.head(url, timeout=5)
+        except Exception as e:
+            print(f"Warmup connection to {url} failed: {e}")
+
+    if audio_pool:
+        from utils.audioWorkers import warm_audio_pool
+        warm_audio_pool()
+
+    print(f"Warmup completed in {time.time() - start_time:.2f} seconds")
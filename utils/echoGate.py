@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Marker file shared by the player (pipeline) and the recorder (AudioConverter),
+# which run as separate processes. Only the standard library is used here so the
+# recorder can import it without the pipeline's dependencies.
+ECHO_GATE_PATH = os.environ.get("ECHO_GATE_PATH", ".playback_gate")
+
+# Capture stays muted this long after playback ends, for room echo and device latency
+ECHO_TAIL_SECONDS = float(os.environ.get("ECHO_TAIL_SECONDS", 0.7))
+
+# A "playing" marker older than this is ignored (the player died mid-playback)
+STALE_PLAYBACK_SECONDS = 300
+
+_lock = threading.Lock()
+_active = 0
+_cache = {"mtime": None, "state": None}
+
+def _write_state(state):
+    temp_path = f"{ECHO_GATE_PATH}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(temp_path, ECHO_GATE_PATH)
+
+def begin_playback():
+    """Mark that answer audio is being played through the speakers"""
+    global _active
+    with _lock:
+        _active += 1
+        _write_state({"playing": True, "since": time.time()})
+
+def end_playback(tail_seconds=ECHO_TAIL_SECONDS):
+    """Mark that playback stopped; capture stays gated for tail_seconds more"""
+    global _active
+    with _lock:
+        _active = max(_active - 1, 0)
+        if not _active:
+            _write_state({"playing": False, "until": time.time() + tail_seconds})
+
+@contextmanager
+def playback_active(tail_seconds=ECHO_TAIL_SECONDS):
+    """Gate capture for the duration of the block plus the tail window"""
+    begin_playback()
+    try:
+        yield
+    finally:
+        end_playback(tail_seconds)
+
+def is_playback_active():
+    """True while answer audio is playing or within the tail window after it"""
+    try:
+        stat_result = os.stat(ECHO_GATE_PATH)
+        mtime = (stat_result.st_mtime_ns, stat_result.st_size)
+    except OSError:
+        return False
+
+    # Re-read the marker only when it changed; the recorder polls this for every audio block
+    if mtime != _cache["mtime"]:
+        try:
+            with open(ECHO_GATE_PATH, "r", encoding="utf-8") as f:
+                _cache["state"] = json.load(f)
+            _cache["mtime"] = mtime
+        except (OSError, ValueError):
+            return False
+
+    state = _cache["state"] or {}
+    now = time.time()
+    if state.get("playing"):
+        return now - state.get("since", 0) < STALE_PLAYBACK_SECONDS
+    return now < state.get("until", 0)
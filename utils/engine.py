@@ -0,0 +1,312 @@
+import asyncio
+import io
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import dotenv
+from utils.clients import get_http_session, get_sarvam_client
+from utils.LLM import answer_budget, budget_for_latency, findsolution, findsolution_direct
+from utils.translate import translate_text
+from utils.faqIndex import match_faq
+from utils.wavStream import IncrementalWavParser, iter_audio_segments, merge_wav_files
+from utils.chunkPlanner import plan_chunks
+from utils.autotune import get_chunk_size
+from utils.singleflight import SingleFlight, normalize_text
+from utils.metrics import stage_latency
+from utils.housekeeping import shard_path
+
+dotenv.load_dotenv()
+SARVAM_AI_API = os.environ.get("SARVAM_AI_API")
+
+# API configuration
+speech_to_text_url = "https://api.sarvam.ai/speech-to-text-translate"
+speech_data = {
+    "model": "saaras:v2",
+    "with_diarization": False
+}
+
+# Concurrent STT and TTS calls per engine
+STT_WORKERS = int(os.environ.get("STT_STREAM_WORKERS", 4))
+TTS_WORKERS = int(os.environ.get("TTS_STREAM_WORKERS", 3))
+# Crossfade between TTS chunks in the merged answer file (0 = plain concatenation)
+MERGE_CROSSFADE_MS = int(os.environ.get("MERGE_CROSSFADE_MS", 0))
+
+# Concurrent requests synthesizing the same chunk text share one TTS call
+_tts_flight = SingleFlight()
+
+def transcribe_segment(wav_bytes, idx=0):
+    """Send one WAV segment to the Sarvam speech-to-text-translate API; returns "" on failure"""
+    try:
+        files = {'file': ('audiofile.wav', io.BytesIO(wav_bytes), 'audio/wav')}
+        response = get_http_session().post(speech_to_text_url, headers={
+            "api-subscription-key": SARVAM_AI_API
+        }, files=files, data=speech_data)
+
+        if response.status_code in [200, 201]:
+            return response.json().get("transcript", "")
+        print(f"❌ STT failed for segment {idx}: {response.status_code}, {response.text}")
+        return ""
+    except Exception as e:
+        print(f"❌ Error in STT segment {idx}: {e}")
+        return ""
+
+def synthesize_chunk(chunk, output_filename):
+    """Synthesize one Bengali text chunk to a WAV file; returns the filename or None on error"""
+    from sarvamai.play import save
+
+    try:
+        response = get_sarvam_client().text_to_speech.convert(
+            text=chunk,
+            target_language_code="bn-IN",
+            speaker="anushka",
+            enable_preprocessing=True,
+        )
+
+        save(response, output_filename)
+        return output_filename
+
+    except Exception as e:
+        print(f"❌ TTS error for {output_filename}: {e}")
+        return None
+
+def synthesize_shared(chunk, output_filename):
+    """
+    Synthesize a chunk, sharing the TTS call with concurrent requests for the same text
+
+    A request that joined another's call gets its own file at output_filename, a
+    hard link to the shared result (or a copy where links are not supported), so
+    each request's audio files stay under its own name and shard.
+    """
+    audio_file = _tts_flight.do(normalize_text(chunk), synthesize_chunk, chunk, output_filename)
+    if not audio_file or audio_file == output_filename:
+        return audio_file
+
+    try:
+        if os.path.exists(output_filename):
+            os.remove(output_filename)
+        try:
+            os.link(audio_file, output_filename)
+        except OSError:
+            shutil.copyfile(audio_file, output_filename)
+        return output_filename
+    except OSError as e:
+        print(f"❌ Could not store shared TTS audio as {output_filename}: {e}")
+        return None
+
+def merge_answer_audio(audio_files, output_path, crossfade_ms=MERGE_CROSSFADE_MS):
+    """Merge an answer's TTS chunks into one file; returns None on failure"""
+    if not audio_files:
+        return None
+    if len(audio_files) == 1:
+        return audio_files[0]
+
+    try:
+        return merge_wav_files(audio_files, output_path, crossfade_ms=crossfade_ms)
+    except Exception as e:
+        print(f"❌ Error merging answer audio: {e}")
+        return None
+
+def request_budget(latency_target, translated):
+    """Answer budget for a request's latency target, or the default spoken length"""
+    if latency_target:
+        return budget_for_latency(latency_target, translated)
+    return answer_budget()
+
+class Engine:
+    """
+    Speech -> answer -> Bengali speech pipeline as an async event stream.
+
+    run() yields one event per stage as soon as it completes:
+      {"type": "transcript", "text"}
+      {"type": "answer", "text", "mode": "faq" | "direct" | "translated", "max_chars"?, "truncated"?}
+      {"type": "translation", "text"}                 (translated mode only)
+      {"type": "audio", "index", "file"}              per synthesized chunk, in order
+      {"type": "done", "result"}                      full result, or {"error"} in result
+
+    Blocking API calls run on the engine's STT/TTS thread pools and the default
+    executor, so one engine can serve many concurrent runs.
+    """
+
+    def __init__(self, stt_workers=STT_WORKERS, tts_workers=TTS_WORKERS, output_dir="responses"):
+        self.stt_workers = stt_workers
+        self.stt_executor = ThreadPoolExecutor(max_workers=stt_workers, thread_name_prefix="engine-stt")
+        self.tts_executor = ThreadPoolExecutor(max_workers=tts_workers, thread_name_prefix="engine-tts")
+        self.output_dir = output_dir
+
+    def submit_segment(self, wav_bytes):
+        """Start transcribing a WAV segment now (e.g. while an upload is still arriving); returns a Future"""
+        return self.stt_executor.submit(transcribe_segment, wav_bytes)
+
+    async def transcribe(self, audio):
+        """
+        Transcribe a file path or WAV bytes, sending its segments to STT concurrently
+
+        Segments are read lazily with at most stt_workers of them in flight, so
+        memory per job does not grow with the recording's length.
+        """
+        chunk_duration_ms = get_chunk_size("stt_chunk_ms")
+
+        if isinstance(audio, (bytes, bytearray)):
+            parser = IncrementalWavParser(chunk_duration_ms)
+            segments = parser.feed(audio) + parser.finish()
+            if not segments and audio:
+                segments = [bytes(audio)]  # Not PCM WAV: let the API decode it
+            segments = iter(segments)
+        else:
+            if not os.path.exists(audio) or os.path.getsize(audio) == 0:
+                return ""
+            # WAV is read segment by segment; other formats are decoded on the audio process pool
+            segments = iter_audio_segments(audio, chunk_duration_ms)
+
+        loop = asyncio.get_running_loop()
+        transcripts = {}
+        in_flight = {}
+        exhausted = False
+
+        try:
+            while True:
+                # Top up the window as segments finish, reading the file off the event loop
+                while not exhausted and len(in_flight) < self.stt_workers:
+                    segment = await asyncio.to_thread(next, segments, None)
+                    if segment is None:
+                        exhausted = True
+                        break
+                    idx = len(transcripts) + len(in_flight)
+                    future = loop.run_in_executor(self.stt_executor, transcribe_segment, segment, idx)
+                    in_flight[future] = idx
+
+                if not in_flight:
+                    break
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    transcripts[in_flight.pop(future)] = future.result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+            try:
+                getattr(segments, "close", lambda: None)()
+            except ValueError:
+                pass  # Cancelled while a worker thread is reading the next segment
+
+        return " ".join(t.strip() for _, t in sorted(transcripts.items()) if t and t.strip())
+
+    async def speak(self, bengali_text, request_id):
+        """Synthesize the answer chunks concurrently, yielding (index, file) in order as each is ready"""
+        chunks = plan_chunks(bengali_text, get_chunk_size("tts_chunk_chars"))
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(self.tts_executor, synthesize_shared, chunk,
+                                 shard_path(self.output_dir, f"tts_{request_id}_{idx + 1:03d}.wav"))
+            for idx, chunk in enumerate(chunks)
+        ]
+        for index, future in enumerate(futures):
+            audio_file = await future
+            if audio_file:
+                yield index, audio_file
+
+    async def run(self, audio=None, transcript=None, request_id=None, direct_answer=False,
+                  latency_target=None, merge=True):
+        """
+        Run the pipeline, yielding stage events
+
+        Args:
+            audio: Recording as a file path or WAV bytes
+            transcript: English transcript if STT already ran (audio is then ignored)
+            request_id: Used to name the output files (default: a new UUID)
+            direct_answer: Ask Gemini to answer in Bengali directly, skipping translation
+            latency_target: Seconds from transcript to last audio chunk, used to budget the answer
+            merge: Also merge the answer audio into a single file (result["merged_audio"])
+        """
+        request_id = request_id or str(uuid.uuid4())
+        timings = {}
+
+        # Step 1: Speech to Text (English), unless already transcribed
+        english_text = transcript
+        if english_text is None:
+            with stage_latency.measure("stt", timings):
+                english_text = await self.transcribe(audio)
+        yield {"type": "transcript", "text": english_text}
+
+        if not english_text or not english_text.strip():
+            yield {"type": "done", "result": {"error": "No speech detected or transcription failed"}}
+            return
+
+        # Common questions are answered from the precomputed FAQ index, skipping steps 2-4
+        faq = await asyncio.to_thread(match_faq, english_text)
+        if faq:
+            yield {"type": "answer", "text": faq["bengali_text"], "mode": "faq", "score": faq["score"]}
+            for index, audio_file in enumerate(faq["audio_files"]):
+                yield {"type": "audio", "index": index, "file": audio_file}
+            yield {"type": "done", "result": {
+                "english_text": english_text,
+                "solution": faq["answer"],
+                "bengali_text": faq["bengali_text"],
+                "answer_mode": "faq",
+                "faq_score": faq["score"],
+                "audio_files": faq["audio_files"],
+                "merged_audio": faq.get("merged_audio"),
+                "timings": timings
+            }}
+            return
+
+        # Step 2: Generate solution using Gemini (directly in Bengali when requested)
+        answer_info = {}
+        with stage_latency.measure("llm", timings):
+            bengali_text = None
+            if direct_answer:
+                bengali_text = await asyncio.to_thread(findsolution_direct, english_text,
+                                                       budget=request_budget(latency_target, False), info=answer_info)
+            if not bengali_text:
+                solution = await asyncio.to_thread(findsolution, english_text,
+                                                   budget=request_budget(latency_target, True), info=answer_info)
+
+        if not bengali_text and not (solution and solution.strip()):
+            yield {"type": "done", "result": {"error": "No answer generated"}}
+            return
+
+        if bengali_text:
+            solution = bengali_text
+            answer_mode = "direct"
+            yield {"type": "answer", "text": bengali_text, "mode": answer_mode, **answer_info}
+        else:
+            answer_mode = "translated"
+            yield {"type": "answer", "text": solution, "mode": answer_mode, **answer_info}
+
+            # Step 3: Translate to Bengali
+            with stage_latency.measure("translate", timings):
+                bengali_text = await asyncio.to_thread(translate_text, solution)
+            yield {"type": "translation", "text": bengali_text}
+
+        # Step 4: Convert Bengali text to speech, streaming each chunk as it is ready
+        audio_files = []
+        merged_audio = None
+        with stage_latency.measure("tts", timings):
+            if bengali_text and bengali_text.strip():
+                async for index, audio_file in self.speak(bengali_text, request_id):
+                    audio_files.append(audio_file)
+                    yield {"type": "audio", "index": index, "file": audio_file}
+
+            # One file for the whole answer, so clients need a single (seekable) download
+            if merge:
+                merged_audio = await asyncio.to_thread(
+                    merge_answer_audio, audio_files, shard_path(self.output_dir, f"tts_{request_id}.wav"))
+
+        yield {"type": "done", "result": {
+            "english_text": english_text,
+            "solution": solution,
+            "bengali_text": bengali_text,
+            "answer_mode": answer_mode,
+            "audio_files": audio_files,
+            "merged_audio": merged_audio,
+            "answer_budget": answer_info,
+            "timings": timings
+        }}
+
+    def run_sync(self, audio=None, **kwargs):
+        """Run the pipeline to completion from synchronous code; returns the final result"""
+        async def collect():
+            async for event in self.run(audio, **kwargs):
+                if event["type"] == "done":
+                    return event["result"]
+        return asyncio.run(collect())
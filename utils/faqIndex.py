@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import threading
+import zlib
+import numpy as np
+from utils.singleflight import normalize_text
+
+# Where the offline-built index lives and where its pre-synthesized audio is stored
+FAQ_INDEX_DIR = os.environ.get("FAQ_INDEX_DIR", "faq_index")
+FAQ_AUDIO_DIR = os.environ.get("FAQ_AUDIO_DIR", "responses")
+
+# Cosine similarity above which a transcript is answered from the index
+FAQ_THRESHOLD = float(os.environ.get("FAQ_THRESHOLD", 0.8))
+
+# Character n-gram sizes and hashed feature dimension
+NGRAM_SIZES = (3, 4, 5)
+FEATURE_DIM = 2 ** 13
+
+def _ngrams(text):
+    """Character n-grams of the normalized text, padded at word boundaries"""
+    text = f" {normalize_text(text, casefold=True)} "
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            yield text[i:i + n]
+
+def term_frequencies(texts):
+    """Sublinear hashed n-gram term frequencies, one row per text"""
+    matrix = np.zeros((len(texts), FEATURE_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for gram in _ngrams(text):
+            matrix[row, zlib.crc32(gram.encode("utf-8")) % FEATURE_DIM] += 1.0
+    return np.log1p(matrix)
+
+def _l2_normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class FAQIndex:
+    """TF-IDF index of frequently asked questions with their cached Bengali answers and audio"""
+
+    def __init__(self, entries, vectors, idf, threshold=FAQ_THRESHOLD):
+        self.entries = entries
+        self.vectors = vectors
+        self.idf = idf
+        self.threshold = threshold
+
+    @classmethod
+    def from_entries(cls, entries, threshold=FAQ_THRESHOLD):
+        """Vectorize the questions of entries"""
+        tf = term_frequencies([entry["question"] for entry in entries])
+        document_frequency = np.count_nonzero(tf, axis=0)
+        idf = (np.log((1 + len(entries)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return cls(entries, _l2_normalize(tf * idf), idf, threshold)
+
+    @classmethod
+    def load(cls, index_dir=FAQ_INDEX_DIR, threshold=FAQ_THRESHOLD):
+        """Load an index written by save()"""
+        with open(os.path.join(index_dir, "entries.json"), "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        vectors = np.load(os.path.join(index_dir, "vectors.npy"))
+        idf = np.load(os.path.join(index_dir, "idf.npy"))
+        return cls(entries, vectors, idf, threshold)
+
+    def save(self, index_dir=FAQ_INDEX_DIR):
+        """Write entries, vectors and IDF weights to index_dir"""
+        os.makedirs(index_dir, exist_ok=True)
+        with open(os.path.join(index_dir, "entries.json"), "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        np.save(os.path.join(index_dir, "vectors.npy"), self.vectors)
+        np.save(os.path.join(index_dir, "idf.npy"), self.idf)
+
+    def search(self, text):
+        """Return (entry, score) of the most similar question, or (None, 0.0) for an empty index"""
+        if not self.entries or not text or not text.strip():
+            return None, 0.0
+
+        query = _l2_normalize(term_frequencies([text]) * self.idf)[0]
+        scores = self.vectors @ query
+        best = int(np.argmax(scores))
+        return self.entries[best], float(scores[best])
+
+    def match(self, text):
+        """Return the cached entry for text if it is close enough to a known question, else None"""
+        entry, score = self.search(text)
+        if entry is None or score < self.threshold:
+            return None
+
+        print(f"FAQ match ({score:.2f}): {entry['question']}")
+        return {**entry, "score": score}
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+def get_faq_index():
+    """Return the FAQ index from FAQ_INDEX_DIR, or None if no index has been built"""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                if os.path.exists(os.path.join(FAQ_INDEX_DIR, "entries.json")):
+                    try:
+                        _index = FAQIndex.load()
+                        print(f"Loaded FAQ index with {len(_index.entries)} entries")
+                    except Exception as e:
+                        print(f"Error loading FAQ index: {e}")
+                _index_loaded = True
+    return _index
+
+def match_faq(text):
+    """Look up text in the FAQ index; None when there is no index or no close match"""
+    index = get_faq_index()
+    return index.match(text) if index else None
+
+def build_index(faq_path, index_dir=FAQ_INDEX_DIR, audio_dir=FAQ_AUDIO_DIR):
+    """
+    Build the FAQ index offline
+
+    Args:
+        faq_path: JSON list of {"question", "answer"?, "bengali_text"?}; missing
+                  answers and translations are generated with the live pipeline
+        index_dir: Directory for entries.json, vectors.npy and idf.npy
+        audio_dir: Directory for the pre-synthesized answer audio
+
+    Returns:
+        The built FAQIndex
+    """
+    from sarvamai.play import save
+    from utils.clients import get_sarvam_client
+    from utils.LLM import findsolution
+    from utils.textToSpeech import split_text_into_chunks
+    from utils.translate import translate_text
+    from utils.wavStream import merge_wav_files
+
+    with open(faq_path, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+
+    os.makedirs(audio_dir, exist_ok=True)
+    client = get_sarvam_client()
+    entries = []
+
+    for idx, faq in enumerate(faqs):
+        question = faq["question"]
+        answer = faq.get("answer") or findsolution(question)
+        bengali_text = faq.get("bengali_text") or translate_text(answer)
+
+        audio_files = []
+        for chunk_idx, chunk in enumerate(split_text_into_chunks(bengali_text)):
+            response = client.text_to_speech.convert(
+                text=chunk,
+                target_language_code="bn-IN",
+                speaker="anushka",
+                enable_preprocessing=True,
+            )
+            output_filename = os.path.join(audio_dir, f"faq_{idx + 1:03d}_{chunk_idx + 1:03d}.wav")
+            save(response, output_filename)
+            audio_files.append(output_filename)
+
+        merged_audio = audio_files[0] if audio_files else None
+        if len(audio_files) > 1:
+            merged_audio = merge_wav_files(audio_files, os.path.join(audio_dir, f"faq_{idx + 1:03d}.wav"))
+
+        entries.append({
+            "question": question,
+            "answer": answer,
+            "bengali_text": bengali_text,
+            "audio_files": audio_files,
+            "merged_audio": merged_audio
+        })
+        print(f"Indexed FAQ {idx + 1}/{len(faqs)}: {question}")
+
+    index = FAQIndex.from_entries(entries)
+    index.save(index_dir)
+    print(f"FAQ index written to {index_dir}")
+    return index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the FAQ index used for instant answers")
+    parser.add_argument("faq_path", help="JSON file with a list of {question, answer?, bengali_text?}")
+    parser.add_argument("--index-dir", default=FAQ_INDEX_DIR)
+    parser.add_argument("--audio-dir", default=FAQ_AUDIO_DIR)
+    args = parser.parse_args()
+
+    build_index(args.faq_path, args.index_dir, args.audio_dir)
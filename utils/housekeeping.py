@@ -0,0 +1,198 @@
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+
+# Stored files go into 256 hashed subdirectories (root/xx/name) so no directory grows unbounded
+SHARD_CHARS = 2
+
+# How often the quota sweeps run
+SWEEP_INTERVAL = float(os.environ.get("HOUSEKEEPING_SWEEP_INTERVAL", 60))
+
+# Per-directory quotas: files older than the age limit are deleted, then the
+# oldest files are deleted until the directory is under its size limit
+AUDIO_CHUNKS_MAX_BYTES = int(os.environ.get("AUDIO_CHUNKS_MAX_MB", 1024)) * 1024 * 1024
+AUDIO_CHUNKS_MAX_AGE = float(os.environ.get("AUDIO_CHUNKS_MAX_AGE", 60 * 60))
+RESPONSES_MAX_BYTES = int(os.environ.get("RESPONSES_MAX_MB", 2048)) * 1024 * 1024
+RESPONSES_MAX_AGE = float(os.environ.get("RESPONSES_MAX_AGE", 24 * 60 * 60))
+
+def shard_dir(root, filename):
+    """Hashed subdirectory of root for filename; files sharing a stem (x.wav, x.ogg) share it"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(root, hashlib.md5(stem.encode("utf-8")).hexdigest()[:SHARD_CHARS])
+
+def shard_path(root, filename):
+    """Path for storing filename under root, creating its shard directory"""
+    directory = shard_dir(root, filename)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(filename))
+
+def resolve_path(root, filename):
+    """Locate a stored file by name: its shard first, then the flat root (pre-built assets)"""
+    filename = os.path.basename(filename)
+    path = os.path.join(shard_dir(root, filename), filename)
+    if os.path.exists(path):
+        return path
+    return os.path.join(root, filename)
+
+def _is_shard(name):
+    return len(name) == SHARD_CHARS and all(c in "0123456789abcdef" for c in name)
+
+def enforce_quota(root, max_bytes=None, max_age=None, exclude=()):
+    """
+    Apply age and size limits to the sharded files under root
+
+    Only files inside shard directories are managed; flat files in root (such
+    as the pre-built FAQ audio) are never deleted. Paths in exclude (files of
+    queued or running jobs) still count towards the size limit but are kept.
+
+    Returns:
+        Number of files deleted
+    """
+    if not os.path.isdir(root):
+        return 0
+
+    files = []
+    for shard in os.scandir(root):
+        if not shard.is_dir() or not _is_shard(shard.name):
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                if entry.is_file():
+                    stat_result = entry.stat()
+                    files.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+            except OSError:
+                continue
+
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    cutoff = time.time() - max_age if max_age else None
+    excluded = {os.path.abspath(path) for path in exclude}
+    deleted = 0
+
+    for mtime, size, path in files:
+        too_old = cutoff is not None and mtime < cutoff
+        too_big = max_bytes is not None and total > max_bytes
+        if not too_old and not too_big:
+            break  # Sorted oldest first: everything after is newer and fits
+        if os.path.abspath(path) in excluded:
+            continue
+        try:
+            os.remove(path)
+            deleted += 1
+            total -= size
+        except OSError:
+            continue
+
+    if deleted:
+        print(f"🗑️ Housekeeping removed {deleted} files from {root}")
+    return deleted
+
+class Housekeeper:
+    """
+    Single background thread running delayed file deletions and periodic quota sweeps.
+
+    Tasks sit in a heap ordered by due time, so any number of pending deletions
+    costs one thread and one heap entry each instead of a sleeping thread per file.
+    """
+
+    def __init__(self, sweep_interval=SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        self._cond = threading.Condition()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._quotas = {}
+        self._protected = set()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Start the housekeeping thread and the periodic quota sweep"""
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="housekeeping", daemon=True)
+            self._thread.start()
+        self.schedule(0, self._sweep)
+        return self
+
+    def stop(self):
+        """Stop the thread; pending tasks are dropped"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def schedule(self, delay, fn, *args):
+        """Run fn(*args) on the housekeeping thread after delay seconds"""
+        with self._cond:
+            heapq.heappush(self._heap, (time.time() + delay, next(self._sequence), fn, args))
+            self._cond.notify()
+
+    def delete_later(self, path, delay=10):
+        """Delete path after delay seconds, dropping any protect()"""
+        self.schedule(delay, self._delete, path)
+
+    def add_quota(self, root, max_bytes=None, max_age=None):
+        """Enforce size and age limits on the sharded files under root at every sweep"""
+        with self._cond:
+            self._quotas[root] = (max_bytes, max_age)
+
+    def protect(self, path):
+        """Exclude path from quota sweeps (e.g. an upload waiting for its job) until release()"""
+        with self._cond:
+            self._protected.add(os.path.abspath(path))
+
+    def release(self, path):
+        """Let quota sweeps delete path again"""
+        with self._cond:
+            self._protected.discard(os.path.abspath(path))
+
+    def pending(self):
+        """Number of scheduled tasks"""
+        with self._cond:
+            return len(self._heap)
+
+    def _delete(self, path):
+        self.release(path)
+        _remove_file(path)
+
+    def _sweep(self):
+        with self._cond:
+            quotas = list(self._quotas.items())
+            protected = set(self._protected)
+        for root, (max_bytes, max_age) in quotas:
+            enforce_quota(root, max_bytes, max_age, exclude=protected)
+        self.schedule(self.sweep_interval, self._sweep)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._heap or self._heap[0][0] > time.time()):
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                if not self._running:
+                    return
+                _, _, fn, args = heapq.heappop(self._heap)
+
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"❌ Housekeeping error: {e}")
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"🗑️ Cleaned up: {os.path.basename(path)}")
+
+housekeeper = Housekeeper()
+
+def start_housekeeping():
+    """Start the shared housekeeper with the default audio directory quotas"""
+    housekeeper.add_quota("audio_chunks", AUDIO_CHUNKS_MAX_BYTES, AUDIO_CHUNKS_MAX_AGE)
+    housekeeper.add_quota("responses", RESPONSES_MAX_BYTES, RESPONSES_MAX_AGE)
+    return housekeeper.start()
@@ -0,0 +1,41 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Weight of the newest sample in each stage's running average
+EWMA_ALPHA = 0.2
+
+class LatencyTracker:
+    """Exponentially weighted moving averages of recent stage latencies, in seconds"""
+
+    def __init__(self, alpha=EWMA_ALPHA):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._averages = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            previous = self._averages.get(stage)
+            self._averages[stage] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def get(self, stage, default=None):
+        with self._lock:
+            return self._averages.get(stage, default)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._averages)
+
+    @contextmanager
+    def measure(self, stage, timings=None):
+        """Time a block, record it under stage and optionally store it in the timings dict"""
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start_time
+            self.record(stage, elapsed)
+            if timings is not None:
+                timings[stage] = round(elapsed, 3)
+
+stage_latency = LatencyTracker()
@@ -1,5 +1,4 @@
-import requests
-import io
+import asyncio
 import dotenv
 import os
 import time
@@ -7,20 +6,46 @@ import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from queue import Queue, Empty
-from pydub import AudioSegment
 import glob
-import re
-from sarvamai import SarvamAI
-from sarvamai.play import play, save
-from utils.LLM import findsolution
+from collections import deque
+from utils.clients import warmup
+from utils.engine import Engine
+from utils.wavStream import merge_wav_files
+from utils.playback import PlaybackQueue
+from utils.scheduler import estimate_audio_duration
+from utils.resultsLog import log_result
+from utils.housekeeping import housekeeper, start_housekeeping
+from utils.profiler import install_signal_handler
+from utils.recordingState import recording_started_at
 
 dotenv.load_dotenv()
-SARVAM_AI_API = os.environ.get("SARVAM_AI_API")
+
+# Ask Gemini to answer in Bengali directly instead of translating its English answer
+DIRECT_ANSWER = os.environ.get("DIRECT_ANSWER", "false").lower() == "true"
+
+# Endpointing of the recorder (utils/AudioConverter.py): a chunk is written once
+# SILENCE_CHUNKS + 1 silent blocks of 1024 samples at 16 kHz follow the speech (the
+# silence is kept in the file), or when it reaches its maximum length mid-speech
+RECORDER_SILENCE_TAIL_SECONDS = float(os.environ.get("RECORDER_SILENCE_TAIL_SECONDS", 51 * 1024 / 16000))
+RECORDER_MAX_SECONDS = float(os.environ.get("RECORDER_MAX_SECONDS", 156 * 1024 / 16000))
+
+# Utterances whose speech starts within this many seconds of the recorder ending the
+# previous chunk are merged into a single pipeline run (the speech pause allowed is
+# RECORDER_SILENCE_TAIL_SECONDS longer)
+UTTERANCE_GAP_SECONDS = float(os.environ.get("UTTERANCE_GAP_SECONDS", 1.5))
+# Time for the watcher to pick up a chunk once the recorder has written it
+FILE_PICKUP_SECONDS = 2.0
+# How often the worker re-checks the recorder's state while waiting for a follow-up
+COALESCE_POLL_SECONDS = 0.1
+# Upper bound on the audio merged into one run
+COALESCE_MAX_SECONDS = float(os.environ.get("COALESCE_MAX_SECONDS", 60))
 
 # Global variables
 is_running = True
 file_queue = Queue()
+held_files = deque()
 processed_files = set()
+engine = Engine()
 
 class AudioFileHandler(FileSystemEventHandler):
     """Handler for monitoring new audio files"""
@@ -59,272 +84,169 @@ class AudioFileHandler(FileSystemEventHandler):
             except (OSError, FileNotFoundError):
                 time.sleep(0.1)
 
-def process_audio_chunk(chunk, chunk_idx):
-    """Process a single audio chunk and return transcript"""
-    chunk_buffer = io.BytesIO()
-    try:
-        chunk.export(chunk_buffer, format="wav")
-        chunk_buffer.seek(0)
-        
-        files = {'file': ('audiofile.wav', chunk_buffer, 'audio/wav')}
-        
-        response = requests.post(speech_to_text_url, headers={
-            "api-subscription-key": SARVAM_AI_API
-        }, files=files, data=speech_data)
-        
-        if response.status_code in [200, 201]:
-            response_data = response.json()
-            transcript = response_data.get("transcript", "")
-            return transcript
-        else:
-            print(f"❌ STT failed for chunk {chunk_idx}: {response.status_code}")
-            return ""
-    except Exception as e:
-        print(f"❌ Error in STT chunk {chunk_idx}: {e}")
-        return ""
-    finally:
-        chunk_buffer.close()
-
-def speech_to_text(audio_file_path, chunk_duration_ms=30*1000):
-    """Convert speech to text"""
-    print(f"🗣️ Converting speech to text: {os.path.basename(audio_file_path)}")
+def process_pipeline(audio_file_path, direct_answer=None):
+    """Complete pipeline: Speech -> Text -> Translation -> Speech"""
+    if direct_answer is None:
+        direct_answer = DIRECT_ANSWER
     
-    if not os.path.exists(audio_file_path) or os.path.getsize(audio_file_path) == 0:
-        return ""
+    start_time = time.time()
+    print(f"\n🚀 Starting pipeline for: {os.path.basename(audio_file_path)}")
     
     try:
-        audio = AudioSegment.from_file(audio_file_path)
-        chunks = []
-        if len(audio) > chunk_duration_ms:
-            for i in range(0, len(audio), chunk_duration_ms):
-                chunks.append(audio[i:i + chunk_duration_ms])
-        else:
-            chunks.append(audio)
+        result = asyncio.run(play_pipeline_events(audio_file_path, direct_answer))
+        if result is None or "error" in result:
+            print("❌ No speech detected or transcription failed")
+            return
         
-        transcripts = []
-        for idx, chunk in enumerate(chunks):
-            transcript = process_audio_chunk(chunk, idx)
-            if transcript.strip():
-                transcripts.append(transcript.strip())
+        processing_time = time.time() - start_time
+        print(f"✅ Pipeline completed in {processing_time:.2f} seconds")
         
-        return " ".join(transcripts)
-    except Exception as e:
-        print(f"❌ Error in speech to text: {e}")
-        return ""
-
-def chunk_text(text, max_length=800):
-    """Splits text into chunks while preserving word boundaries"""
-    if len(text) <= max_length:
-        return [text.strip()]
-    
-    chunks = []
-    while len(text) > max_length:
-        split_index = text.rfind(" ", 0, max_length)
-        if split_index == -1:
-            split_index = max_length
+        # Save results to the shared append-only log
+        log_result(
+            source="pipeline",
+            audio_file=audio_file_path,
+            **{**result, "timings": {**result["timings"], "total": round(processing_time, 3)}}
+        )
         
-        chunks.append(text[:split_index].strip())
-        text = text[split_index:].lstrip()
-    
-    if text:
-        chunks.append(text.strip())
-    
-    return chunks
-
-def translate_text(english_text):
-    """Translate English text to Bengali"""
-    if not english_text.strip():
-        return ""
-    
-    print(f"🔄 Translating text: {english_text[:50]}...")
-    
-    try:
-        chunks = chunk_text(english_text)
-        translated_texts = []
-        
-        for idx, chunk in enumerate(chunks):
-            payload = {
-                "source_language_code": "en-IN",
-                "target_language_code": "bn-IN",
-                "speaker_gender": "Male",
-                "mode": "formal",
-                "model": "mayura:v1",
-                "enable_preprocessing": False,
-                "input": chunk
-            }
-            
-            response = requests.post(translate_url, json=payload, headers=headers)
-            
-            if response.status_code == 200:
-                translated_text = response.json().get("translated_text", "")
-                translated_texts.append(translated_text)
-                print(f"✅ Translated chunk {idx + 1}")
-            else:
-                print(f"❌ Translation failed for chunk {idx + 1}: {response.status_code}")
-                translated_texts.append(chunk)  # Fallback to original text
+        print(f"💾 Results saved")
         
-        return " ".join(translated_texts)
     except Exception as e:
-        print(f"❌ Error in translation: {e}")
-        return english_text  # Return original text on error
+        print(f"❌ Pipeline error: {e}")
 
-def split_text_for_tts(text, max_length=400):
-    """Split text into smaller chunks for TTS processing"""
-    if len(text) <= max_length:
-        return [text.strip()]
+async def play_pipeline_events(audio_file_path, direct_answer):
+    """Run the engine on a recording, printing each stage and playing audio chunks as they arrive"""
+    playback = None
+    played = 0
+    result = None
     
-    chunks = []
-    sentences = re.split(r'[।.!?]+', text)
-    current_chunk = ""
+    try:
+        async for event in engine.run(audio_file_path, direct_answer=direct_answer, merge=False):
+            if event["type"] == "transcript":
+                print(f"📝 English transcript: {event['text']}")
+            elif event["type"] == "answer":
+                labels = {"faq": "⚡ FAQ answer", "direct": "💡 Solution found (Bengali)", "translated": "💡 Solution found"}
+                print(f"{labels[event['mode']]}: {event['text']}")
+            elif event["type"] == "translation":
+                print(f"🔄 Bengali translation: {event['text']}")
+            elif event["type"] == "audio":
+                # Chunk 1 starts playing as soon as it is synthesized
+                if playback is None:
+                    print("🔊 Playing Bengali audio...")
+                    playback = PlaybackQueue().start()
+                playback.put(played, filename=event["file"])
+                played += 1
+            elif event["type"] == "done":
+                result = event["result"]
+    finally:
+        if playback is not None:
+            playback.close(played)
+            await asyncio.to_thread(playback.join)
     
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-            
-        if len(current_chunk) + len(sentence) + 1 > max_length:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-                current_chunk = sentence
-            else:
-                # Split long sentence by words
-                words = sentence.split()
-                temp_chunk = ""
-                for word in words:
-                    if len(temp_chunk) + len(word) + 1 > max_length:
-                        if temp_chunk:
-                            chunks.append(temp_chunk.strip())
-                            temp_chunk = word
-                        else:
-                            chunks.append(word[:max_length])
-                            temp_chunk = word[max_length:]
-                    else:
-                        temp_chunk += " " + word if temp_chunk else word
-                if temp_chunk:
-                    current_chunk = temp_chunk
-        else:
-            current_chunk += " " + sentence if current_chunk else sentence
+    return result
+
+def next_audio_file(timeout):
+    """Next file to process, preferring files held back by coalesce_utterances"""
+    if held_files:
+        return held_files.popleft()
+    return file_queue.get(timeout=timeout)
+
+def utterance_bounds(file_path):
+    """
+    (start, end) wall-clock time of the speech in a recorded chunk
     
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    The recorder writes a chunk when its silence tail has passed, so the speech
+    ends RECORDER_SILENCE_TAIL_SECONDS before the file's mtime, unless the chunk
+    was cut at RECORDER_MAX_SECONDS while the speaker was still talking.
+    """
+    written = os.path.getmtime(file_path)
+    duration = estimate_audio_duration(file_path)
+    tail = 0.0 if duration >= RECORDER_MAX_SECONDS - 0.1 else min(RECORDER_SILENCE_TAIL_SECONDS, duration)
+    return written - duration, written - tail
+
+def follow_up_deadline(last_written):
+    """
+    Time until which to wait for an utterance continuing a chunk written at last_written
     
-    return chunks
+    A follow-up must start within UTTERANCE_GAP_SECONDS of that write. If the
+    recorder reports an utterance in progress that started in time, its file can
+    take up to RECORDER_MAX_SECONDS to be written, so the wait is extended to that.
+    """
+    deadline = last_written + UTTERANCE_GAP_SECONDS
+    started = recording_started_at()
+    if started is not None and started - last_written <= UTTERANCE_GAP_SECONDS:
+        deadline = max(deadline, started + RECORDER_MAX_SECONDS + FILE_PICKUP_SECONDS)
+    return deadline
 
-def text_to_speech(bengali_text):
-    """Convert Bengali text to speech"""
-    if not bengali_text.strip():
-        return []
+def coalesce_utterances(first_path):
+    """
+    Collect the utterances that continue first_path
     
-    print(f"🎤 Converting text to speech: {bengali_text[:50]}...")
+    The recorder writes a new chunk every time the speaker pauses, so one
+    hesitant question arrives as several files. Files already queued, or
+    arriving before follow_up_deadline(), are grouped with first_path while
+    the speech in each one starts within the recorder's silence tail plus
+    UTTERANCE_GAP_SECONDS of the previous one's speech ending. Without a
+    follow-up being recorded, the wait ends UTTERANCE_GAP_SECONDS after the
+    last chunk was written.
     
-    try:
-        client = SarvamAI(api_subscription_key=SARVAM_AI_API)
-        chunks = split_text_for_tts(bengali_text, max_length=300)
-        
-        print(f"📝 Text split into {len(chunks)} TTS chunks")
-        
-        result_queue = Queue()
-        
-        def tts_worker(chunk, index):
-            try:
-                response = client.text_to_speech.convert(
-                    text=chunk,
-                    target_language_code="bn-IN",
-                    speaker="anushka",
-                    enable_preprocessing=True,
-                )
-                
-                output_filename = f"tts_output_{int(time.time())}_{index + 1:03d}.wav"
-                save(response, output_filename)
-                result_queue.put((index, response, output_filename))
-                print(f"✅ TTS chunk {index + 1} completed")
-            except Exception as e:
-                print(f"❌ TTS error for chunk {index + 1}: {e}")
-                result_queue.put((index, None, None))
-        
-        # Process TTS chunks in batches
-        max_threads = 3
-        for i in range(0, len(chunks), max_threads):
-            batch = chunks[i:i + max_threads]
-            threads = []
-            
-            for j, chunk in enumerate(batch):
-                thread = threading.Thread(target=tts_worker, args=(chunk, i + j))
-                thread.start()
-                threads.append(thread)
-            
-            for thread in threads:
-                thread.join()
-        
-        # Collect and sort results
-        results = []
-        while not result_queue.empty():
-            results.append(result_queue.get())
+    Returns:
+        List of file paths in recording order
+    """
+    group = [first_path]
+    _, last_end = utterance_bounds(first_path)
+    total = estimate_audio_duration(first_path)
+    max_pause = RECORDER_SILENCE_TAIL_SECONDS + UTTERANCE_GAP_SECONDS
+    last_written = os.path.getmtime(first_path)
+    
+    while total < COALESCE_MAX_SECONDS:
+        remaining = follow_up_deadline(last_written) - time.time()
+        try:
+            file_path = next_audio_file(min(max(remaining, 0), COALESCE_POLL_SECONDS))
+        except Empty:
+            if remaining <= 0:
+                break
+            continue
         
-        results.sort(key=lambda x: x[0])
+        if file_path in processed_files or file_path in group:
+            file_queue.task_done()
+            continue
         
-        # Play audio files in order
-        print("🔊 Playing Bengali audio...")
-        for index, response, filename in results:
-            if response:
-                try:
-                    play(response)
-                    time.sleep(0.3)  # Brief pause between chunks
-                except Exception as e:
-                    print(f"❌ Error playing chunk {index + 1}: {e}")
+        try:
+            start, end = utterance_bounds(file_path)
+        except OSError:
+            file_queue.task_done()
+            continue
         
-        return [filename for _, _, filename in results if filename]
+        duration = estimate_audio_duration(file_path)
+        if start - last_end > max_pause or total + duration > COALESCE_MAX_SECONDS:
+            # Separate question: process it next on its own
+            held_files.appendleft(file_path)
+            break
         
-    except Exception as e:
-        print(f"❌ Error in text to speech: {e}")
-        return []
+        group.append(file_path)
+        last_end = end
+        last_written = max(last_written, start + duration)
+        total += duration
+        file_queue.task_done()
+    
+    # The periodic scan can queue files newest first
+    group.sort(key=os.path.getmtime)
+    return group
 
-def process_pipeline(audio_file_path):
-    """Complete pipeline: Speech -> Text -> Translation -> Speech"""
-    start_time = time.time()
-    print(f"\n🚀 Starting pipeline for: {os.path.basename(audio_file_path)}")
+def merge_utterances(group):
+    """Merge a group of utterance files into one WAV; returns its path, or None on failure"""
+    base_name = os.path.splitext(group[0])[0]
+    merged_path = f"{base_name}_merged.wav"
+    # Registered first so the file watcher ignores the merged file
+    processed_files.add(merged_path)
     
     try:
-        # Step 1: Speech to Text (English)
-        english_text = speech_to_text(audio_file_path)
-        if not english_text.strip():
-            print("❌ No speech detected or transcription failed")
-            return
-        
-        print(f"📝 English transcript: {english_text}")
-
-        solution = findsolution(english_text)
-        print(f"💡 Solution found: {solution}")
-        
-        # Step 2: Translate to Bengali
-        bengali_text = translate_text(solution)
-        if not bengali_text.strip():
-            print("❌ Translation failed")
-            return
-        
-        print(f"🔄 Bengali translation: {bengali_text}")
-        
-        # Step 3: Text to Speech (Bengali)
-        audio_files = text_to_speech(bengali_text)
-        
-        processing_time = time.time() - start_time
-        print(f"✅ Pipeline completed in {processing_time:.2f} seconds")
-        
-        # Save results
-        base_name = os.path.splitext(audio_file_path)[0]
-        
-        # Save English transcript
-        with open(f"{base_name}_english.txt", 'w', encoding='utf-8') as f:
-            f.write(f"English Transcript:\n{english_text}\n")
-        
-        # Save Bengali translation
-        with open(f"{base_name}_bengali.txt", 'w', encoding='utf-8') as f:
-            f.write(f"Bengali Translation:\n{bengali_text}\n")
-        
-        print(f"💾 Results saved")
-        
+        merge_wav_files(group, merged_path)
+        print(f"🔗 Merged {len(group)} utterances into {os.path.basename(merged_path)}")
+        return merged_path
     except Exception as e:
-        print(f"❌ Pipeline error: {e}")
+        print(f"❌ Could not merge utterances: {e}")
+        return None
 
 def pipeline_worker():
     """Worker thread that processes files through the complete pipeline"""
@@ -333,25 +255,29 @@ def pipeline_worker():
     
     while is_running:
         try:
-            audio_file_path = file_queue.get(timeout=0.5)
+            audio_file_path = next_audio_file(0.5)
             
             if audio_file_path in processed_files:
                 file_queue.task_done()
                 continue
             
-            # Process through complete pipeline
-            process_pipeline(audio_file_path)
+            # Back-to-back utterances become one pipeline run
+            group = coalesce_utterances(audio_file_path)
+            merged_path = merge_utterances(group) if len(group) > 1 else None
+            
+            if merged_path:
+                process_pipeline(merged_path)
+                group.append(merged_path)
+            else:
+                for file_path in group:
+                    process_pipeline(file_path)
             
             # Mark as processed
-            processed_files.add(audio_file_path)
+            processed_files.update(group)
             
-            # Clean up original audio file after processing
-            cleanup_thread = threading.Thread(
-                target=delayed_cleanup, 
-                args=(audio_file_path, 10), 
-                daemon=True
-            )
-            cleanup_thread.start()
+            # Clean up original audio files after processing
+            for file_path in group:
+                housekeeper.delete_later(file_path, 10)
             
             file_queue.task_done()
             
@@ -361,16 +287,6 @@ def pipeline_worker():
             print(f"❌ Pipeline worker error: {e}")
             time.sleep(0.1)
 
-def delayed_cleanup(file_path, delay_seconds):
-    """Clean up file after delay"""
-    time.sleep(delay_seconds)
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"🗑️ Cleaned up: {os.path.basename(file_path)}")
-    except Exception as e:
-        print(f"❌ Cleanup error: {e}")
-
 def periodic_scan(audio_dir):
     """Periodically scan for new files"""
     global is_running
@@ -398,6 +314,13 @@ def start_pipeline(audio_dir="audio_chunks"):
     
     os.makedirs(audio_dir, exist_ok=True)
     
+    # Load SDKs and open connections before accepting work
+    warmup()
+    start_housekeeping()
+    
+    # `kill -USR1 <pid>` writes a 10 s profile to profiles/
+    install_signal_handler()
+    
     print("🎯 Voice Translation Pipeline Started")
     print(f"📁 Monitoring: {os.path.abspath(audio_dir)}")
     print("🎤 Record English -> 🔄 Translate -> 🗣️ Bengali Audio")
@@ -429,4 +352,7 @@ def start_pipeline(audio_dir="audio_chunks"):
         print("\n🛑 Stopping pipeline...")
         is_running = False
         observer.stop()
-        observer.join()
\ No newline at end of file
+        observer.join()
+
+if __name__ == "__main__":
+    start_pipeline()
@@ -0,0 +1,123 @@
+import os
+import shutil
+import threading
+import time
+from utils.echoGate import playback_active
+
+# Where synthesized answers are played: "speaker", "file" (copy to PLAYBACK_DIR) or "null"
+AUDIO_SINK = os.environ.get("AUDIO_SINK", "speaker")
+PLAYBACK_DIR = os.environ.get("PLAYBACK_DIR", "playback")
+
+# Brief pause between consecutive chunks
+PLAYBACK_GAP_SECONDS = 0.3
+
+class SpeakerSink:
+    """Plays audio through the local speakers"""
+
+    def play(self, index, response=None, filename=None):
+        # The recorder ignores the microphone while this runs, so the answer is not re-captured
+        with playback_active():
+            if response is not None:
+                from sarvamai.play import play
+                play(response)
+            elif filename:
+                from pydub import AudioSegment
+                from pydub.playback import play as play_segment
+                play_segment(AudioSegment.from_wav(filename))
+
+class FileSink:
+    """Copies each played chunk into a directory, for headless runs"""
+
+    def __init__(self, output_dir=PLAYBACK_DIR):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def play(self, index, response=None, filename=None):
+        if filename:
+            target = os.path.join(self.output_dir, f"played_{int(time.time() * 1000)}_{index + 1:03d}.wav")
+            shutil.copyfile(filename, target)
+
+class NullSink:
+    """Discards audio but records the order chunks were played in, for testing"""
+
+    def __init__(self):
+        self.played = []
+
+    def play(self, index, response=None, filename=None):
+        self.played.append(index)
+
+def get_sink(name=None):
+    """Create the audio sink configured by AUDIO_SINK (or name)"""
+    name = (name or AUDIO_SINK).lower()
+    if name == "null":
+        return NullSink()
+    if name == "file":
+        return FileSink()
+    return SpeakerSink()
+
+class PlaybackQueue:
+    """
+    Plays chunks in index order as soon as each one is available.
+
+    Producers call put() from any thread as chunks finish (in any order); a
+    consumer thread plays chunk N the moment chunks 0..N-1 have been played and
+    N has arrived. Failed chunks are put with response and filename of None and
+    are skipped.
+    """
+
+    def __init__(self, sink=None, gap_seconds=PLAYBACK_GAP_SECONDS):
+        self.sink = sink or get_sink()
+        self.gap_seconds = gap_seconds
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._total = None
+        self._thread = None
+
+    def start(self):
+        """Start the consumer thread"""
+        self._thread = threading.Thread(target=self._consume, daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, index, response=None, filename=None):
+        """Hand over a finished chunk"""
+        with self._cond:
+            self._pending[index] = (response, filename)
+            self._cond.notify()
+
+    def close(self, total):
+        """Declare how many chunks will be put in total"""
+        with self._cond:
+            self._total = total
+            self._cond.notify()
+
+    def join(self, timeout=None):
+        """Wait until every chunk has been played"""
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _consume(self):
+        next_index = 0
+        while True:
+            with self._cond:
+                while next_index not in self._pending and (self._total is None or next_index < self._total):
+                    self._cond.wait()
+                if self._total is not None and next_index >= self._total:
+                    return
+                response, filename = self._pending.pop(next_index)
+
+            if response is not None or filename:
+                try:
+                    self.sink.play(next_index, response=response, filename=filename)
+                    time.sleep(self.gap_seconds)
+                except Exception as e:
+                    print(f"❌ Error playing chunk {next_index + 1}: {e}")
+            next_index += 1
+
+def play_audio_files(audio_files, sink=None):
+    """Play saved WAV files in order"""
+    playback = PlaybackQueue(sink).start()
+    for index, filename in enumerate(audio_files):
+        playback.put(index, filename=filename)
+    playback.close(len(audio_files))
+    playback.join()
@@ -0,0 +1,146 @@
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.005))
+# Longest profile a caller may ask for
+MAX_PROFILE_SECONDS = 120
+# Number of allocation sites reported in an allocation snapshot
+ALLOCATION_TOP = 30
+# Where signal-triggered profiles are written
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+_profile_lock = threading.Lock()
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+def sample_stacks(seconds, interval=SAMPLE_INTERVAL):
+    """
+    Sample the stacks of every thread except the caller for the given duration
+
+    Returns:
+        Counter of collapsed stacks ("thread;outer;...;inner") to sample counts
+    """
+    names = {}
+    counts = Counter()
+    own_id = threading.get_ident()
+    deadline = time.time() + seconds
+
+    while time.time() < deadline:
+        frames = sys._current_frames()
+        if len(names) != len(frames):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for thread_id, frame in frames.items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            counts[";".join(reversed(stack))] += 1
+
+        del frames
+        time.sleep(interval)
+
+    return counts
+
+def format_collapsed(counts):
+    """Collapsed stack lines ("stack count"), the input format of flamegraph.pl and speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+def _allocation_top(snapshot, limit=ALLOCATION_TOP):
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+def profile(seconds, allocations=False, interval=SAMPLE_INTERVAL):
+    """
+    Profile the running process
+
+    Args:
+        seconds: Sampling duration, capped at MAX_PROFILE_SECONDS
+        allocations: Also trace memory allocations made during the window
+        interval: Seconds between samples
+
+    Returns:
+        {"seconds", "samples", "collapsed", "allocations"?}
+
+    Raises:
+        RuntimeError: If another profile is already running
+    """
+    seconds = min(max(float(seconds), 0.1), MAX_PROFILE_SECONDS)
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+
+    started_tracing = False
+    try:
+        if allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+
+        counts = sample_stacks(seconds, interval)
+        result = {
+            "seconds": seconds,
+            "samples": sum(counts.values()),
+            "collapsed": format_collapsed(counts)
+        }
+        if allocations:
+            result["allocations"] = _allocation_top(tracemalloc.take_snapshot())
+        return result
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _profile_lock.release()
+
+def write_profile(seconds, allocations=True, output_dir=PROFILE_DIR):
+    """Profile and write profile_{timestamp}.folded (and .alloc.txt) to output_dir; returns the stacks path"""
+    result = profile(seconds, allocations)
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f"profile_{int(time.time())}")
+
+    with open(f"{base}.folded", "w", encoding="utf-8") as f:
+        f.write(result["collapsed"])
+    if allocations:
+        with open(f"{base}.alloc.txt", "w", encoding="utf-8") as f:
+            for stat in result["allocations"]:
+                f.write(f"{stat['size_kb']:>10} KB {stat['count']:>8} {stat['location']}\n")
+
+    print(f"📈 Profile written: {base}.folded ({result['samples']} samples)")
+    return f"{base}.folded"
+
+def install_signal_handler(seconds=10, allocations=True):
+    """
+    Profile for the given duration whenever the process receives SIGUSR1 (`kill -USR1 <pid>`)
+
+    Must be called from the main thread. Returns False where SIGUSR1 does not exist (Windows).
+    """
+    signum = getattr(signal, "SIGUSR1", None)
+    if signum is None:
+        return False
+
+    def run():
+        try:
+            write_profile(seconds, allocations)
+        except Exception as e:
+            print(f"❌ Profile error: {e}")
+
+    def handler(signum, frame):
+        # Sample from a separate thread so the interrupted thread keeps running
+        threading.Thread(target=run, name="profiler", daemon=True).start()
+
+    signal.signal(signum, handler)
+    return True
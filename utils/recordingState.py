@@ -0,0 +1,51 @@
+import json
+import os
+import time
+
+# Marker file written by the recorder (AudioConverter) while it is capturing an
+# utterance and read by the pipeline, which runs as a separate process. Only the
+# standard library is used here so the recorder can import it without the
+# pipeline's dependencies.
+RECORDING_STATE_PATH = os.environ.get("RECORDING_STATE_PATH", ".recording_state")
+
+# A "recording" marker older than this is ignored (the recorder died mid-utterance)
+STALE_RECORDING_SECONDS = 60
+
+_cache = {"mtime": None, "state": None}
+
+def _write_state(state):
+    temp_path = f"{RECORDING_STATE_PATH}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(temp_path, RECORDING_STATE_PATH)
+
+def begin_recording():
+    """Mark that the recorder started capturing an utterance"""
+    _write_state({"recording": True, "since": time.time()})
+
+def end_recording():
+    """Mark that the recorder saved or dropped the utterance it was capturing"""
+    _write_state({"recording": False, "until": time.time()})
+
+def recording_started_at():
+    """Wall-clock time the utterance being recorded right now started, or None"""
+    try:
+        stat_result = os.stat(RECORDING_STATE_PATH)
+        mtime = (stat_result.st_mtime_ns, stat_result.st_size)
+    except OSError:
+        return None
+
+    # Re-read the marker only when it changed; the pipeline polls it while coalescing
+    if mtime != _cache["mtime"]:
+        try:
+            with open(RECORDING_STATE_PATH, "r", encoding="utf-8") as f:
+                _cache["state"] = json.load(f)
+            _cache["mtime"] = mtime
+        except (OSError, ValueError):
+            return None
+
+    state = _cache["state"] or {}
+    since = state.get("since", 0)
+    if state.get("recording") and time.time() - since < STALE_RECORDING_SECONDS:
+        return since
+    return None
@@ -0,0 +1,148 @@
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+
+# Append-only JSONL file holding one record per processed utterance
+RESULTS_LOG_PATH = os.environ.get("RESULTS_LOG_PATH", "results/results.jsonl")
+
+# Buffered records are written once this many are pending or this many seconds have passed
+RESULTS_FLUSH_BATCH = int(os.environ.get("RESULTS_FLUSH_BATCH", 50))
+RESULTS_FLUSH_INTERVAL = float(os.environ.get("RESULTS_FLUSH_INTERVAL", 2.0))
+
+class ResultsLog:
+    """
+    Append-only JSONL store for pipeline results.
+
+    append() only buffers the record; a background thread writes pending records
+    with a single write and fsync per batch, so a busy pipeline costs one file
+    and a handful of syncs instead of several small files per utterance.
+    """
+
+    def __init__(self, path=RESULTS_LOG_PATH, batch_size=RESULTS_FLUSH_BATCH,
+                 flush_interval=RESULTS_FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = []
+        self._thread = None
+        self._closed = False
+
+    def append(self, record):
+        """Queue a result record (a JSON-serializable dict); a timestamp is added if missing"""
+        record = {"timestamp": time.time(), **record}
+        with self._cond:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._flusher, name="results-log", daemon=True)
+                self._thread.start()
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Write all pending records now"""
+        with self._cond:
+            records, self._pending = self._pending, []
+        if not records:
+            return
+
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with self._write_lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self):
+        """Stop the background flusher and write what is left"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def query(self, since=None, until=None, source=None, contains=None, limit=None):
+        """
+        Read records back from the log
+
+        Args:
+            since: Only records at or after this UNIX timestamp
+            until: Only records before this UNIX timestamp
+            source: Only records from this source (e.g. "pipeline", "api", "speechToText")
+            contains: Only records whose transcript, answer or translation contains this text
+            limit: Return at most this many of the newest matching records
+
+        Returns:
+            List of matching records, oldest first
+        """
+        self.flush()
+        if not os.path.exists(self.path):
+            return []
+
+        matches = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Partial line from an interrupted write
+
+                timestamp = record.get("timestamp", 0)
+                if since is not None and timestamp < since:
+                    continue
+                if until is not None and timestamp >= until:
+                    continue
+                if source is not None and record.get("source") != source:
+                    continue
+                if contains is not None:
+                    texts = (record.get(field) or "" for field in ("english_text", "solution", "bengali_text"))
+                    if not any(contains in text for text in texts):
+                        continue
+                matches.append(record)
+
+        return matches[-limit:] if limit else matches
+
+    def _flusher(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing results log: {e}")
+            if closed:
+                return
+
+results_log = ResultsLog()
+atexit.register(results_log.close)
+
+def log_result(**fields):
+    """Append a result record to the shared results log"""
+    results_log.append(fields)
+
+def query_results(**filters):
+    """Query the shared results log; see ResultsLog.query"""
+    return results_log.query(**filters)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the pipeline results log")
+    parser.add_argument("--since", type=float, help="Only records from the last N hours")
+    parser.add_argument("--source", help="pipeline, api or speechToText")
+    parser.add_argument("--contains", help="Text to look for in transcripts, answers and translations")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    since = time.time() - args.since * 3600 if args.since else None
+    for record in query_results(since=since, source=args.source, contains=args.contains, limit=args.limit):
+        print(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,155 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+import wave
+
+# Number of pipeline jobs processed concurrently
+PIPELINE_WORKERS = int(os.environ.get("PIPELINE_WORKERS", 3))
+
+# Fixed cost (seconds) added to every job for the LLM, translate and TTS stages,
+# which barely depend on recording length
+JOB_BASE_COST = float(os.environ.get("JOB_BASE_COST", 2.0))
+
+# Bytes per second assumed when a recording's duration cannot be read from its header
+# (16 kHz, mono, 16-bit PCM as produced by AudioConverter)
+FALLBACK_BYTES_PER_SECOND = 16000 * 2
+
+# Weight of the newest job in the running average of wall-clock seconds per unit of cost
+LATENCY_EWMA_ALPHA = 0.2
+
+def estimate_audio_duration(audio_path):
+    """Estimate the duration of a recording in seconds without decoding it"""
+    try:
+        with wave.open(audio_path, "rb") as wf:
+            return wf.getnframes() / float(wf.getframerate())
+    except Exception:
+        try:
+            return os.path.getsize(audio_path) / FALLBACK_BYTES_PER_SECOND
+        except OSError:
+            return 0.0
+
+def estimate_job_cost(audio_path):
+    """Estimated processing cost of a pipeline job, in seconds of work"""
+    return JOB_BASE_COST + estimate_audio_duration(audio_path)
+
+class JobScheduler:
+    """
+    Runs pipeline jobs on a fixed pool of worker threads.
+
+    Jobs are ordered with self-clocked fair queuing: each job gets a virtual finish
+    tag of max(virtual time, client's previous finish tag) + cost, and the job with
+    the smallest tag runs next. Dispatching a job advances the virtual clock to its
+    finish tag, so jobs submitted later start behind the ones already waiting.
+    Short jobs therefore overtake long ones, a client with many queued jobs only
+    advances at its fair share, and a long job runs at the latest once the jobs
+    dispatched ahead of it have moved the clock past its finish tag, however many
+    new clients keep arriving.
+    """
+
+    def __init__(self, workers=PIPELINE_WORKERS):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._heap = []
+        self._client_finish = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._threads = []
+        self._running = False
+        self._active = 0
+        self._queued_cost = 0.0
+        self._active_cost = 0.0
+        self.seconds_per_cost = 1.0
+
+    def start(self):
+        """Start the worker threads"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"pipeline-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        """Stop the worker threads once their current jobs finish; queued jobs are dropped"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, fn, *args, client_id="anonymous", cost=1.0):
+        """Queue fn(*args) on behalf of client_id with the given estimated cost"""
+        with self._cond:
+            start_tag = max(self._virtual_time, self._client_finish.get(client_id, 0.0))
+            finish_tag = start_tag + max(cost, 0.0)
+            self._client_finish[client_id] = finish_tag
+            heapq.heappush(self._heap, (finish_tag, next(self._sequence), start_tag, client_id, cost, fn, args))
+            self._queued_cost += cost
+            self._cond.notify()
+
+    def queued_cost(self):
+        """Total estimated cost of the jobs waiting for a worker"""
+        with self._cond:
+            return self._queued_cost
+
+    def queued(self):
+        """Number of jobs waiting for a worker"""
+        with self._cond:
+            return len(self._heap)
+
+    def active(self):
+        """Number of jobs currently running"""
+        with self._cond:
+            return self._active
+
+    def estimated_wait(self):
+        """Estimated seconds before a job submitted now would start, from recent job latencies"""
+        with self._cond:
+            if self._active + len(self._heap) < self.workers:
+                return 0.0
+            # Running jobs are on average half done
+            backlog = self._queued_cost + self._active_cost / 2
+            return backlog * self.seconds_per_cost / self.workers
+
+    def _next_job(self):
+        with self._cond:
+            while self._running and not self._heap:
+                self._cond.wait()
+            if not self._running:
+                return None
+
+            finish_tag, _, start_tag, client_id, cost, fn, args = heapq.heappop(self._heap)
+            self._virtual_time = max(self._virtual_time, finish_tag)
+            if not self._heap:
+                # Idle system: forget old tags so returning clients start fresh
+                self._client_finish = {}
+                self._virtual_time = 0.0
+            self._queued_cost = max(self._queued_cost - cost, 0.0)
+            self._active_cost += cost
+            self._active += 1
+            return cost, fn, args
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            cost, fn, args = job
+            start_time = time.time()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Scheduled job error: {e}")
+            finally:
+                elapsed = time.time() - start_time
+                with self._cond:
+                    self._active -= 1
+                    self._active_cost = max(self._active_cost - cost, 0.0)
+                    if cost > 0:
+                        self.seconds_per_cost += LATENCY_EWMA_ALPHA * (elapsed / cost - self.seconds_per_cost)
@@ -7,7 +7,9 @@ import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from queue import Queue
-from pydub import AudioSegment
+from utils.wavStream import iter_audio_segments
+from utils.resultsLog import log_result
+from utils.autotune import get_chunk_size
 
 dotenv.load_dotenv()
 SARVAM_AI_API = os.environ.get("SARVAM_AI_API")
@@ -40,30 +42,21 @@ class AudioFileHandler(FileSystemEventHandler):
 
 def split_audio(audio_path, chunk_duration_ms):
     """
-    Splits an audio file into smaller chunks of specified duration.
+    Yields WAV-encoded chunks of specified duration.
+    WAV files are streamed from disk, so memory stays constant regardless of
+    recording length; other formats are decoded on the audio process pool.
     """
     try:
-        audio = AudioSegment.from_file(audio_path)
-        chunks = []
-        if len(audio) > chunk_duration_ms:
-            for i in range(0, len(audio), chunk_duration_ms):
-                chunks.append(audio[i:i + chunk_duration_ms])
-        else:
-            chunks.append(audio)
-        return chunks
+        yield from iter_audio_segments(audio_path, chunk_duration_ms)
     except Exception as e:
         print(f"Error splitting audio {audio_path}: {e}")
-        return []
 
 def process_audio_chunk(chunk, chunk_idx, headers, data):
     """
-    Process a single audio chunk and return transcript
+    Process a single WAV-encoded audio chunk and return transcript
     """
-    chunk_buffer = io.BytesIO()
+    chunk_buffer = io.BytesIO(chunk)
     try:
-        chunk.export(chunk_buffer, format="wav")
-        chunk_buffer.seek(0)
-        
         files = {'file': ('audiofile.wav', chunk_buffer, 'audio/wav')}
         
         response = requests.post(api_url, headers=headers, files=files, data=data)
@@ -81,10 +74,11 @@ def process_audio_chunk(chunk, chunk_idx, headers, data):
     finally:
         chunk_buffer.close()
 
-def translate_audio(audio_file_path, headers, data, chunk_duration_ms=5*60*1000):
+def translate_audio(audio_file_path, headers, data, chunk_duration_ms=None):
     """
     Translates audio into text with optional diarization and timestamps.
     """
+    chunk_duration_ms = chunk_duration_ms or get_chunk_size("stt_chunk_ms")
     print(f"Processing audio file: {audio_file_path}")
     
     # Check if file exists and has content
@@ -92,18 +86,19 @@ def translate_audio(audio_file_path, headers, data, chunk_duration_ms=5*60*1000)
         print(f"File {audio_file_path} does not exist or is empty")
         return {"transcript": "", "language": ""}
     
-    chunks = split_audio(audio_file_path, chunk_duration_ms)
-    if not chunks:
-        return {"transcript": "", "language": ""}
-    
     transcripts = []
     language = ""
+    chunk_count = 0
     
-    for idx, chunk in enumerate(chunks):
+    for idx, chunk in enumerate(split_audio(audio_file_path, chunk_duration_ms)):
+        chunk_count += 1
         transcript = process_audio_chunk(chunk, idx, headers, data)
         if transcript:
             transcripts.append(transcript)
     
+    if not chunk_count:
+        return {"transcript": "", "language": ""}
+    
     collated_transcript = " ".join(transcripts)
     
     # Clean up processed file
@@ -146,10 +141,9 @@ def audio_processor_worker():
                 print(f"Text: {result['transcript']}")
                 print(f"==================\n")
                 
-                # Save transcript to file
-                transcript_file = audio_file_path.replace('.wav', '_transcript.txt')
-                with open(transcript_file, 'w', encoding='utf-8') as f:
-                    f.write(result['transcript'])
+                # Save transcript to the shared results log
+                log_result(source="speechToText", audio_file=audio_file_path,
+                           english_text=result["transcript"])
             
             # Mark as processed
             processed_files.add(audio_file_path)
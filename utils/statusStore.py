@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+
+class StatusStore:
+    """
+    Job status dict with a version per entry and async waiters for long-polling.
+
+    Behaves like a dict of request_id -> status for plain reads and writes; every
+    write bumps the entry's version and wakes coroutines waiting for it to change.
+    The JSON body of each version is serialized at most once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._waiters = {}
+
+    def __setitem__(self, key, status):
+        with self._lock:
+            version = self._entries[key]["version"] + 1 if key in self._entries else 1
+            self._entries[key] = {"version": version, "status": status, "body": None}
+            waiters = self._waiters.pop(key, [])
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def __getitem__(self, key):
+        with self._lock:
+            return self._entries[key]["status"]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry["status"] if entry else default
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry["status"] if entry else default
+
+    def version(self, key):
+        """Current version of an entry, or None if it does not exist"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry["version"] if entry else None
+
+    def snapshot(self, key):
+        """Return (version, status, serialized JSON body) of an entry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["body"] is None:
+                entry["body"] = json.dumps(entry["status"], ensure_ascii=False).encode("utf-8")
+            return entry["version"], entry["status"], entry["body"]
+
+    async def wait_for_change(self, key, version, timeout):
+        """Wait until the entry's version differs from version, or timeout seconds elapse"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["version"] != version:
+                return
+            self._waiters.setdefault(key, []).append((loop, future))
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(key)
+                if waiters and (loop, future) in waiters:
+                    waiters.remove((loop, future))
+                    if not waiters:
+                        del self._waiters[key]
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
@@ -1,16 +1,19 @@
-import requests
-from sarvamai import SarvamAI
-from sarvamai.play import play, save
 import os
 import dotenv
-import time
-import threading
-from queue import Queue
-import re
+from utils.clients import get_http_session
+from utils.singleflight import SingleFlight, normalize_text
+from utils.autotune import get_chunk_size
+from utils.chunkPlanner import plan_chunks
 
 dotenv.load_dotenv()
 SARVAM_AI_API = os.environ.get("SARVAM_AI_API")
 
+# API configuration
+translate_url = "https://api.sarvam.ai/translate"
+
+# Concurrent translations of the same text share one set of API calls
+_translate_flight = SingleFlight()
+
 def read_file(file_path, lang_name):
     try:
         with open(file_path, "r", encoding="utf-8") as file:
@@ -36,30 +39,13 @@ def read_file(file_path, lang_name):
     except Exception as e:
         print(f"An error occurred while reading {file_path}: {e}")
         return None
-    
-english_doc = read_file("", "English")
 
-def chunk_text(text, max_length=1000):
-    """Splits text into chunks of at most max_length characters while preserving word boundaries."""
+def chunk_text(text, max_length=None):
+    """Splits text into as few chunks of at most max_length characters as possible, keeping sentences whole."""
     if text is None:
         return []
-        
-    chunks = []
-
-    while len(text) > max_length:
-        split_index = text.rfind(" ", 0, max_length)  # Find the last space within limit
-        if split_index == -1:
-            split_index = max_length  # No space found, force split at max_length
+    return plan_chunks(text, max_length or get_chunk_size("translate_chunk_chars"))
 
-        chunks.append(text[:split_index].strip())  # Trim spaces before adding
-        text = text[split_index:].lstrip()  # Remove leading spaces for the next chunk
-
-    if text:
-        chunks.append(text.strip())  # Add the last chunk
-
-    return chunks
-
-# Function to translate text from English to Bengali
 def translate_text(input_text, source_lang="en-IN", target_lang="bn-IN", mode="formal"):
     """
     Translate text using Sarvam API
@@ -75,37 +61,48 @@ def translate_text(input_text, source_lang="en-IN", target_lang="bn-IN", mode="f
     """
     if not input_text or not input_text.strip():
         return ""
-        
-    # Define API request details
-    url = "https://api.sarvam.ai/translate"
+    
+    key = (normalize_text(input_text), source_lang, target_lang, mode)
+    return _translate_flight.do(key, _translate_text, input_text, source_lang, target_lang, mode)
+
+def translate_chunk(chunk, source_lang="en-IN", target_lang="bn-IN", mode="formal"):
+    """
+    Translate one chunk (at most the API's input limit) with a single API call
+
+    Raises:
+        RuntimeError: If the API answers with an error status
+    """
     headers = {
         "api-subscription-key": SARVAM_AI_API,
         "Content-Type": "application/json"
     }
-    
+    payload = {
+        "source_language_code": source_lang,
+        "target_language_code": target_lang,
+        "speaker_gender": "Male",
+        "mode": mode,
+        "model": "mayura:v1",
+        "enable_preprocessing": False,
+        "input": chunk
+    }
+
+    # Sent over the shared connection pool
+    response = get_http_session().post(translate_url, json=payload, headers=headers)
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.status_code}, {response.text}")
+    return response.json().get("translated_text", "")
+
+def _translate_text(input_text, source_lang, target_lang, mode):
+    """Translate text chunk by chunk (not coalesced; use translate_text)"""
     # Split text into chunks
     text_chunks = chunk_text(input_text)
     
-    # Send requests for each chunk
     translated_texts = []
-    for idx, chunk in enumerate(text_chunks):
-        payload = {
-            "source_language_code": source_lang,
-            "target_language_code": target_lang,
-            "speaker_gender": "Male",
-            "mode": mode,
-            "model": "mayura:v1",
-            "enable_preprocessing": False,
-            "input": chunk
-        }
-
-        response = requests.post(url, json=payload, headers=headers)
-
-        if response.status_code == 200:
-            translated_text = response.json().get("translated_text", "")
-            translated_texts.append(translated_text)
-        else:
-            print(f"Error: {response.status_code}, {response.text}")
+    for chunk in text_chunks:
+        try:
+            translated_texts.append(translate_chunk(chunk, source_lang, target_lang, mode))
+        except RuntimeError as e:
+            print(f"Error: {e}")
 
     # Combine all translated chunks
     final_translation = " ".join(translated_texts)
@@ -0,0 +1,80 @@
+import numpy as np
+
+# Defaults match the recorder in AudioConverter.py (16 kHz mono 16-bit, amplitude threshold 500)
+SAMPLE_RATE = 16000
+THRESHOLD = 500
+FRAME_MS = 32
+SILENCE_MS = 800
+MIN_SPEECH_MS = 300
+MAX_UTTERANCE_MS = 30 * 1000
+
+class EnergyEndpointer:
+    """
+    Energy-based voice activity detection and endpointing for a 16-bit mono PCM stream.
+
+    feed() accepts PCM of any length and returns every utterance it completes;
+    an utterance ends after SILENCE_MS of quiet frames or at MAX_UTTERANCE_MS.
+    Utterances shorter than MIN_SPEECH_MS of speech are dropped as noise.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, threshold=THRESHOLD, silence_ms=SILENCE_MS,
+                 min_speech_ms=MIN_SPEECH_MS, max_utterance_ms=MAX_UTTERANCE_MS):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.frame_bytes = sample_rate * FRAME_MS // 1000 * 2
+        self.silence_frames = max(silence_ms // FRAME_MS, 1)
+        self.min_speech_frames = max(min_speech_ms // FRAME_MS, 1)
+        self.max_frames = max(max_utterance_ms // FRAME_MS, 1)
+        self._pending = bytearray()
+        self.reset()
+
+    def reset(self):
+        """Forget the utterance in progress"""
+        self._frames = []
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self.in_speech = False
+
+    def feed(self, pcm):
+        """Add PCM bytes; returns a list of completed utterances (PCM bytes)"""
+        self._pending += pcm
+        utterances = []
+
+        while len(self._pending) >= self.frame_bytes:
+            frame = bytes(self._pending[:self.frame_bytes])
+            del self._pending[:self.frame_bytes]
+            utterance = self._process_frame(frame)
+            if utterance:
+                utterances.append(utterance)
+
+        return utterances
+
+    def flush(self):
+        """End the current utterance now (e.g. the client stopped talking); returns it or None"""
+        if self._pending and self.in_speech:
+            self._frames.append(bytes(self._pending))
+        self._pending = bytearray()
+        return self._finish()
+
+    def _process_frame(self, frame):
+        amplitude = np.abs(np.frombuffer(frame, dtype=np.int16).astype(np.int32)).mean()
+
+        if amplitude > self.threshold:
+            self.in_speech = True
+            self._speech_frames += 1
+            self._silent_frames = 0
+            self._frames.append(frame)
+        elif self.in_speech:
+            self._silent_frames += 1
+            self._frames.append(frame)  # Keep brief pauses inside the utterance
+
+        if self.in_speech and (self._silent_frames >= self.silence_frames or len(self._frames) >= self.max_frames):
+            return self._finish()
+        return None
+
+    def _finish(self):
+        utterance = None
+        if self._speech_frames >= self.min_speech_frames:
+            utterance = b"".join(self._frames)
+        self.reset()
+        return utterance
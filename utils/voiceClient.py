@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import json
+import os
+import wave
+import websockets
+
+FRAME_MS = 32
+# Longest wait for the next server message before the session is abandoned
+RECEIVE_TIMEOUT = 120
+
+async def run_session(url, wav_path, output_dir="ws_responses", realtime=True, direct_answer=False,
+                      timeout=RECEIVE_TIMEOUT):
+    """
+    Stream a 16-bit mono WAV file to the /ws/voice endpoint as if it were a microphone,
+    print every stage event and save the returned audio chunks.
+
+    Returns:
+        List of received events (audio chunks are listed with their saved path)
+
+    Raises:
+        asyncio.TimeoutError: If the server sends nothing for timeout seconds
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    events = []
+
+    with wave.open(wav_path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError("Expected a 16-bit mono WAV file")
+        sample_rate = wf.getframerate()
+        pcm = wf.readframes(wf.getnframes())
+
+    frame_bytes = sample_rate * FRAME_MS // 1000 * 2
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "start", "sample_rate": sample_rate, "direct_answer": direct_answer}))
+
+        for i in range(0, len(pcm), frame_bytes):
+            await ws.send(pcm[i:i + frame_bytes])
+            if realtime:
+                await asyncio.sleep(FRAME_MS / 1000)
+
+        await ws.send(json.dumps({"type": "end"}))
+
+        pending_audio = None
+        while True:
+            message = await asyncio.wait_for(ws.recv(), timeout)
+            if isinstance(message, bytes):
+                path = os.path.join(output_dir, pending_audio.get("file") or f"chunk_{pending_audio['index']:03d}.wav")
+                with open(path, "wb") as f:
+                    f.write(message)
+                print(f"Audio chunk {pending_audio['index'] + 1} saved: {path}")
+                events.append({**pending_audio, "saved": path})
+                continue
+
+            event = json.loads(message)
+            if event["type"] == "audio":
+                pending_audio = event
+                continue
+
+            print(f"[{event['type']}] {event.get('text') or event.get('message') or event.get('error') or ''}")
+            events.append(event)
+            if event["type"] == "done":
+                break
+
+        await ws.send(json.dumps({"type": "stop"}))
+
+    return events
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scripted client for the /ws/voice endpoint")
+    parser.add_argument("wav_path", help="16-bit mono WAV file to stream as microphone input")
+    parser.add_argument("--url", default=f"ws://localhost:{os.environ.get('PORT', 8000)}/ws/voice")
+    parser.add_argument("--output-dir", default="ws_responses")
+    parser.add_argument("--fast", action="store_true", help="Send audio as fast as possible instead of in real time")
+    parser.add_argument("--direct-answer", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(run_session(args.url, args.wav_path, args.output_dir, not args.fast, args.direct_answer))
@@ -0,0 +1,212 @@
+import struct
+import wave
+from utils.audioWorkers import decode_audio, pcm_to_wav
+
+def iter_wav_segments(audio_path, chunk_duration_ms):
+    """
+    Yield WAV-encoded segments read straight from a PCM WAV file.
+    Only one segment is held in memory at a time, whatever the file length.
+    Raises wave.Error if the file is not PCM WAV.
+    """
+    with wave.open(audio_path, "rb") as wf:
+        frame_rate = wf.getframerate()
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        frames_per_segment = max(frame_rate * chunk_duration_ms // 1000, 1)
+
+        while True:
+            pcm = wf.readframes(frames_per_segment)
+            if not pcm:
+                break
+            yield pcm_to_wav(pcm, frame_rate, channels, sample_width)
+
+def is_pcm_wav(audio_path):
+    """Check whether a file can be streamed by iter_wav_segments"""
+    try:
+        with wave.open(audio_path, "rb"):
+            return True
+    except (wave.Error, EOFError):
+        return False
+
+def iter_audio_segments(audio_path, chunk_duration_ms):
+    """
+    Yield WAV-encoded segments of any audio file.
+    PCM WAV is streamed from disk; other formats are decoded on the audio process pool.
+    """
+    if is_pcm_wav(audio_path):
+        yield from iter_wav_segments(audio_path, chunk_duration_ms)
+        return
+
+    pcm = decode_audio(audio_path)
+    try:
+        yield from pcm.wav_segments(chunk_duration_ms)
+    finally:
+        pcm.release()
+
+# Give up on incremental parsing if no data chunk shows up within this many header bytes
+MAX_HEADER_BYTES = 64 * 1024
+
+class IncrementalWavParser:
+    """
+    Parses a WAV byte stream as it arrives and cuts it into WAV-encoded segments.
+
+    feed() returns every segment completed by the new bytes; finish() returns the
+    final partial segment. If the stream is not PCM WAV, failed is set and no
+    segments are produced, so the caller can fall back to decoding the whole file.
+    """
+
+    def __init__(self, segment_duration_ms):
+        self.segment_duration_ms = segment_duration_ms
+        self.failed = False
+        self.header_parsed = False
+        self.frame_rate = None
+        self.channels = None
+        self.sample_width = None
+        self._buffer = bytearray()
+        self._data_remaining = None
+        self._segment_bytes = None
+
+    @property
+    def frame_size(self):
+        return self.channels * self.sample_width
+
+    def feed(self, data):
+        """Add received bytes and return the segments they complete"""
+        if self.failed:
+            return []
+
+        self._buffer += data
+        if not self.header_parsed and not self._parse_header():
+            return []
+        return self._take_segments(final=False)
+
+    def finish(self):
+        """Return the remaining partial segment once the stream has ended"""
+        if self.failed or not self.header_parsed:
+            return []
+        return self._take_segments(final=True)
+
+    def _fail(self):
+        self.failed = True
+        self._buffer = bytearray()
+        return False
+
+    def _parse_header(self):
+        buf = self._buffer
+        if len(buf) < 12:
+            return False
+        if buf[0:4] != b"RIFF" or buf[8:12] != b"WAVE":
+            return self._fail()
+
+        pos = 12
+        while len(buf) >= pos + 8:
+            chunk_id = bytes(buf[pos:pos + 4])
+            size = int.from_bytes(buf[pos + 4:pos + 8], "little")
+
+            if chunk_id == b"data":
+                if self.frame_rate is None:
+                    return self._fail()
+                del self._buffer[:pos + 8]
+                # Streaming writers leave the size as 0 or 0xFFFFFFFF; read to the end then
+                self._data_remaining = size if size not in (0, 0xFFFFFFFF) else None
+                self.header_parsed = True
+                return True
+
+            if len(buf) < pos + 8 + size:
+                break
+
+            if chunk_id == b"fmt ":
+                if size < 16:
+                    return self._fail()
+                audio_format, channels, frame_rate, _, _, bits = struct.unpack("<HHIIHH", buf[pos + 8:pos + 24])
+                # Sample widths the wave module can write back out: 8 to 32 bits
+                if audio_format != 1 or not channels or not frame_rate or bits % 8 or not 1 <= bits // 8 <= 4:
+                    return self._fail()
+                self.channels = channels
+                self.frame_rate = frame_rate
+                self.sample_width = bits // 8
+                frames = max(frame_rate * self.segment_duration_ms // 1000, 1)
+                self._segment_bytes = frames * self.frame_size
+
+            pos += 8 + size + (size & 1)
+
+        if len(buf) > MAX_HEADER_BYTES:
+            return self._fail()
+        return False
+
+    def _take_segments(self, final):
+        if self._data_remaining is not None and len(self._buffer) > self._data_remaining:
+            # Drop trailing chunks (LIST etc.) after the audio data
+            del self._buffer[self._data_remaining:]
+
+        segments = []
+        while len(self._buffer) >= self._segment_bytes:
+            segments.append(self._cut(self._segment_bytes))
+
+        if final:
+            usable = len(self._buffer) - len(self._buffer) % self.frame_size
+            if usable:
+                segments.append(self._cut(usable))
+            self._buffer = bytearray()
+
+        return segments
+
+    def _cut(self, nbytes):
+        pcm = bytes(self._buffer[:nbytes])
+        del self._buffer[:nbytes]
+        if self._data_remaining is not None:
+            self._data_remaining -= nbytes
+        return pcm_to_wav(pcm, self.frame_rate, self.channels, self.sample_width)
+
+def merge_wav_files(wav_paths, output_path, crossfade_ms=0):
+    """
+    Concatenate WAV files with identical formats into one file.
+
+    Args:
+        wav_paths: Input files, in playback order
+        output_path: Merged WAV to write
+        crossfade_ms: Length of a linear crossfade between consecutive files (16-bit audio only)
+
+    Returns:
+        output_path
+    """
+    import numpy as np
+
+    params = None
+    merged = None
+    for path in wav_paths:
+        with wave.open(path, "rb") as wf:
+            file_params = (wf.getnchannels(), wf.getsampwidth(), wf.getframerate())
+            if params is None:
+                params = file_params
+            elif file_params != params:
+                raise ValueError(f"{path} has format {file_params}, expected {params}")
+            pcm = wf.readframes(wf.getnframes())
+
+        channels, sample_width, frame_rate = params
+        dtype = np.int16 if sample_width == 2 else np.uint8
+        samples = np.frombuffer(pcm, dtype=dtype).reshape(-1, channels if sample_width == 2 else channels * sample_width)
+
+        if merged is None:
+            merged = samples
+            continue
+
+        fade_frames = min(frame_rate * crossfade_ms // 1000, len(merged), len(samples)) if sample_width == 2 else 0
+        if fade_frames:
+            ramp = np.linspace(0.0, 1.0, fade_frames, dtype=np.float32)[:, None]
+            overlap = merged[-fade_frames:] * (1.0 - ramp) + samples[:fade_frames] * ramp
+            overlap = np.clip(np.round(overlap), -32768, 32767).astype(np.int16)
+            merged = np.concatenate([merged[:-fade_frames], overlap, samples[fade_frames:]])
+        else:
+            merged = np.concatenate([merged, samples])
+
+    if params is None:
+        raise ValueError("No WAV files to merge")
+
+    channels, sample_width, frame_rate = params
+    with wave.open(output_path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(frame_rate)
+        wf.writeframes(merged.tobytes())
+    return output_path